@@ -0,0 +1,145 @@
+"""Bulk import of ad copies from CSV or JSONL files.
+
+Rows are read as a stream, validated, checked against the content hashes
+of the ads already in ad_copies (and of earlier rows in the file), and
+inserted in multi-row batches through BatchWriter.
+"""
+import io
+import csv
+import json
+
+from db import BatchWriter, fetch_all, WRITE_BATCH_SIZE
+from translator import AD_FIELDS, PLACEHOLDER_PATTERN, source_fingerprint
+
+REQUIRED_FIELDS = ['headline', 'body']
+
+def content_hash(ad):
+    """Fingerprint of an ad's text, ignoring case and whitespace differences"""
+    normalized = [' '.join((ad.get(name) or '').split()).lower() for name in AD_FIELDS]
+    return source_fingerprint(json.dumps(normalized, ensure_ascii=False))
+
+def read_records(file, name, on_read=None):
+    """Yield records from a binary or text file object, CSV unless name ends in .jsonl or .json.
+
+    CSV rows come as dicts and JSONL lines as unparsed strings, so import_ads
+    can report a bad line against its row number and carry on.
+    on_read(byte_count) is called with the size of every line read. A binary
+    file is left open and usable when the records run out.
+    """
+    wrapper = None
+    if isinstance(file, (io.RawIOBase, io.BufferedIOBase)):
+        # Binary uploads, utf-8-sig drops the BOM spreadsheet exports add
+        file = wrapper = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+
+    def lines():
+        for line in file:
+            if on_read:
+                on_read(len(line.encode('utf-8')))
+            yield line
+
+    try:
+        if name.endswith(('.jsonl', '.json')):
+            for line in lines():
+                if line.strip():
+                    yield line
+        else:
+            yield from csv.DictReader(lines())
+    finally:
+        # A collected TextIOWrapper closes the file under it, which belongs to the caller
+        if wrapper is not None:
+            wrapper.detach()
+
+def parse_record(record):
+    """Turn a CSV row or JSONL line into an ad dict, raising ValueError for malformed input"""
+    if isinstance(record, str):
+        try:
+            record = json.loads(record)
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+    if not isinstance(record, dict):
+        raise ValueError("Row is not an object")
+    return {name: '' if record.get(name) is None else str(record[name]).strip() for name in AD_FIELDS}
+
+def validate_ad(ad):
+    """Return the problems that would stop a row from being imported"""
+    errors = [f"{name} is required" for name in REQUIRED_FIELDS if not ad.get(name)]
+    for name in AD_FIELDS:
+        text = ad.get(name) or ''
+        tags = PLACEHOLDER_PATTERN.findall(text)
+        if text.count('<') != len(tags) or text.count('>') != len(tags):
+            errors.append(f"{name} has an unclosed or stray < > placeholder bracket")
+        if any(not tag[1:-1].strip() for tag in tags):
+            errors.append(f"{name} has an empty <> placeholder")
+    return errors
+
+def existing_hashes(supabase):
+    return {content_hash(ad) for ad in fetch_all(supabase, 'ad_copies', ','.join(AD_FIELDS))}
+
+def import_ads(supabase, records, batch_size=WRITE_BATCH_SIZE, on_progress=None):
+    """Insert new ad copies from an iterable of records from read_records.
+
+    Malformed rows, rows failing validation, rows duplicating an existing ad
+    or an earlier row, and rows the database rejects are skipped and listed
+    in errors as (row_number, message), counting the first data row as 1. A
+    file that cannot be read any further ends the import with an error for
+    the row it stopped at; rows before it are still written. on_progress(result)
+    is called after every batch. Returns the result dict with read,
+    inserted, duplicates and errors.
+    """
+    result = {'read': 0, 'inserted': 0, 'duplicates': 0, 'errors': []}
+    seen = existing_hashes(supabase)
+    writer = BatchWriter(supabase, 'ad_copies', batch_size=batch_size)
+    batch = []
+
+    def write_batch():
+        failed_before = len(writer.failed_rows)
+        writer.add([row for _, row in batch])
+        writer.flush()
+        # BatchWriter keeps the row objects it could not write, map them back to row numbers
+        failed = {id(row): error for row, error in zip(writer.failed_rows[failed_before:], writer.errors[failed_before:])}
+        for number, row in batch:
+            if id(row) in failed:
+                result['errors'].append((number, f"Insert failed: {failed[id(row)]}"))
+            else:
+                result['inserted'] += 1
+        batch.clear()
+        if on_progress:
+            on_progress(result)
+
+    records = iter(records)
+    number = 0
+    while True:
+        number += 1
+        try:
+            record = next(records)
+        except StopIteration:
+            break
+        except (ValueError, csv.Error) as e:
+            # Undecodable bytes or broken CSV quoting, the reader cannot go on
+            result['errors'].append((number, f"Could not read the rest of the file: {e}"))
+            break
+
+        result['read'] += 1
+        try:
+            ad = parse_record(record)
+        except ValueError as e:
+            result['errors'].append((number, str(e)))
+            continue
+        errors = validate_ad(ad)
+        if errors:
+            result['errors'].append((number, "; ".join(errors)))
+            continue
+
+        key = content_hash(ad)
+        if key in seen:
+            result['duplicates'] += 1
+            continue
+        seen.add(key)
+
+        batch.append((number, ad))
+        if len(batch) >= batch_size:
+            write_batch()
+
+    if batch:
+        write_batch()
+    return result
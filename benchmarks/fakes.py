@@ -0,0 +1,190 @@
+"""Offline stand-ins for the Gemini model and the Supabase client"""
+import re
+import json
+import time
+import random
+import itertools
+import threading
+
+class ServiceUnavailable(Exception):
+    """Same name as the Google API error, so it is retried like one"""
+    code = 503
+
+class FakeUsage:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+class FakeResponse:
+    def __init__(self, text, prompt_tokens, output_tokens):
+        self.text = text
+        self.usage_metadata = FakeUsage(prompt_tokens, output_tokens)
+
+class FakeGemini:
+    """Answers the app's translate, packed, fan-out and proofread prompts without a network.
+
+    Latency is log-normal around latency_ms, a share of calls given by
+    error_rate fail with a retryable 503, and token usage is reported as
+    prompt size times token_ratio.
+    """
+
+    model_name = 'models/fake-gemini'
+
+    def __init__(self, latency_ms=50, latency_sigma=0.5, error_rate=0.0, token_ratio=2.0, seed=0):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.token_ratio = token_ratio
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        with self.lock:
+            self.calls += 1
+            delay = self.random.lognormvariate(0, self.latency_sigma) * self.latency_ms / 1000 if self.latency_ms else 0
+            failed = self.random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        time.sleep(delay)
+        if failed:
+            raise ServiceUnavailable("fake overload")
+
+        prompt_tokens = len(prompt) // 4
+        response = FakeResponse(self._answer(prompt), prompt_tokens, int(prompt_tokens * (self.token_ratio - 1)))
+        return iter([response]) if stream else response
+
+    def _answer(self, prompt):
+        if 'translation quality expert' in prompt:
+            translated = re.search(r'^Translation: (.*)$', prompt, re.M).group(1)
+            return json.dumps({'score': 70 + len(translated) % 30, 'corrected': translated, 'feedback': 'ok'})
+
+        fields = re.search(r'Fields to translate:\n(.*?)\n\nReturn ONLY', prompt, re.S)
+        if fields:
+            values = json.loads(fields.group(1))
+            codes = re.findall(r'^Market (\S+) \(', prompt, re.M)
+            if codes:
+                return json.dumps({code: {name: f"[{code}] {text}" for name, text in values.items()} for code in codes})
+            return json.dumps({name: f"[tr] {text}" for name, text in values.items()})
+
+        items = re.search(r'Items to translate:\n(.*?)\n\nReturn ONLY', prompt, re.S)
+        if items:
+            numbered = re.findall(r'^(\d+)\. (".*")$', items.group(1), re.M)
+            return json.dumps({number: f"[tr] {json.loads(text)}" for number, text in numbered})
+
+        text = re.search(r'Text to translate:\n(.*)\n\nReturn ONLY', prompt, re.S)
+        return f"[tr] {text.group(1)}" if text else ''
+
+class FakeResult:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.action = 'select'
+        self.payload = None
+        self.filters = []
+        self.order_by = None
+        self.row_limit = None
+
+    def select(self, columns='*', count=None, head=False):
+        self.action = 'select'
+        return self
+
+    def insert(self, rows):
+        self.action, self.payload = 'insert', rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self.action, self.payload = 'upsert', rows if isinstance(rows, list) else [rows]
+        return self
+
+    def update(self, values):
+        self.action, self.payload = 'update', values
+        return self
+
+    def delete(self):
+        self.action = 'delete'
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) > value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) >= value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by = (column, desc)
+        return self
+
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    def execute(self):
+        return self.client._execute(self)
+
+class FakeSupabase:
+    """In-memory tables behind the subset of the supabase-py query API the app uses.
+
+    Every execute() counts as one request and sleeps latency_ms, so batched
+    writes show up in the numbers.
+    """
+
+    def __init__(self, latency_ms=0):
+        self.latency_ms = latency_ms
+        self.tables = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.request_seconds = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def _execute(self, query):
+        started = time.perf_counter()
+        time.sleep(self.latency_ms / 1000)
+        with self.lock:
+            rows = self.tables.setdefault(query.table, [])
+            if query.action in ('insert', 'upsert'):
+                by_id = {row['id']: row for row in rows}
+                data = []
+                for row in query.payload:
+                    row = dict(row)
+                    if query.action == 'upsert' and row.get('id') in by_id:
+                        by_id[row['id']].update(row)
+                    else:
+                        row.setdefault('id', next(self.ids))
+                        rows.append(row)
+                    data.append(row)
+            else:
+                data = [row for row in rows if all(check(row) for check in query.filters)]
+                if query.action == 'update':
+                    for row in data:
+                        row.update(query.payload)
+                elif query.action == 'delete':
+                    self.tables[query.table] = [row for row in rows if row not in data]
+                if query.order_by:
+                    data.sort(key=lambda row: row.get(query.order_by[0]), reverse=query.order_by[1])
+                if query.row_limit is not None:
+                    data = data[:query.row_limit]
+            self.requests += 1
+            self.request_seconds.append(time.perf_counter() - started)
+        return FakeResult(data, len(data))
@@ -0,0 +1,215 @@
+"""Throughput benchmark for the translate -> proofread -> insert pipeline.
+
+Runs entirely offline against FakeGemini and FakeSupabase, so it needs no
+API key, database or network:
+
+    python -m benchmarks.pipeline --batch-sizes 10,50,200 --output results.json
+    python -m benchmarks.pipeline --baseline results.json --max-regression 0.2
+
+Two scenarios are measured for every batch size: "bulk" runs a real bulk
+job through JobManager (planner, fan-out, proofreading, BatchWriter), and
+"text" translates each ad body with translate_text and proofreads it, one
+(ad, country) pair per task. With --baseline the exit code is 1 if any
+scenario's tasks/sec dropped by more than --max-regression.
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+import gemini_client
+from db import BatchWriter
+from gemini_client import RateLimitedModel, RateLimiter
+from jobs import JobManager, JobStore, make_task
+from translation_cache import TranslationCache, set_cache
+from translation_memory import get_memory
+from telemetry import get_telemetry
+from translator import translate_text, proofread_translation, run_concurrently, chunked, MAX_LANGUAGES_PER_CALL
+from benchmarks.fakes import FakeGemini, FakeSupabase
+
+LANGUAGES = [('FR', 'French'), ('DE', 'German'), ('JP', 'Japanese'), ('ES', 'Spanish'), ('IT', 'Italian'), ('BR', 'Portuguese')]
+LINK_TEXTS = ['Shop now', 'Learn more', 'Sign up', 'Get offer']
+PRODUCTS = ['<product>', 'Smart Watch', 'Running Shoes', 'Coffee Maker']
+WORDS = 'get save new best today only limited offer free shipping deal quality style comfort fast easy'.split()
+
+def make_ads(count, seed=0):
+    rng = random.Random(seed)
+    return [{
+        'id': i + 1,
+        'headline': ' '.join(rng.choices(WORDS, k=4)).capitalize() + '!',
+        'body': f"{' '.join(rng.choices(WORDS, k=8)).capitalize()} on <product>. {' '.join(rng.choices(WORDS, k=6)).capitalize()}.",
+        'link_text': rng.choice(LINK_TEXTS),
+        'product': rng.choice(PRODUCTS)
+    } for i in range(count)]
+
+def make_countries(count):
+    return [{
+        'country_code': code,
+        'language': language,
+        'system_prompt': f"You are a professional {language} marketing translator.",
+        'user_prompt': f"Keep the tone natural for {language} speaking customers."
+    } for code, language in LANGUAGES[:count]]
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+class StageTimer:
+    """Model wrapper that records the latency of every call by pipeline stage"""
+
+    def __init__(self, model):
+        self.model = model
+        self.model_name = model.model_name
+        self.latencies = {'translate': [], 'proofread': []}
+
+    def generate_content(self, prompt, **kwargs):
+        stage = 'proofread' if 'translation quality expert' in prompt else 'translate'
+        started = time.perf_counter()
+        try:
+            return self.model.generate_content(prompt, **kwargs)
+        finally:
+            self.latencies[stage].append(time.perf_counter() - started)
+
+def run_bulk(ads, countries, model, supabase, workers):
+    manager = JobManager(JobStore(':memory:'))
+    tasks = [make_task(ad, group) for ad in ads for group in chunked(countries, MAX_LANGUAGES_PER_CALL)]
+    job_id = manager.enqueue('bulk', 'benchmark', tasks, supabase, model, workers)
+    manager.threads[job_id].join()
+    job = manager.store.get_job(job_id)
+    return job['completed'], job['failed']
+
+def run_text(ads, countries, model, supabase, workers):
+    def translate_pair(pair):
+        ad, country = pair
+        translated = translate_text(ad['body'], country['language'], country['user_prompt'], country['system_prompt'], model)
+        score, corrected, _ = proofread_translation(ad['body'], translated, country['language'], model)
+        return {'ad_copy_id': ad['id'], 'country_code': country['country_code'], 'language': country['language'], 'body': corrected, 'quality_score': score}
+
+    failed = 0
+    with BatchWriter(supabase, 'translations') as writer:
+        for _, row, error in run_concurrently(translate_pair, [(ad, c) for ad in ads for c in countries], workers):
+            if error:
+                failed += 1
+            else:
+                writer.add([row])
+    return len(ads) * len(countries) - failed, failed
+
+SCENARIOS = {'bulk': run_bulk, 'text': run_text}
+
+def run_scenario(name, batch_size, args):
+    # Start every run cold
+    set_cache(TranslationCache(path=None))
+    memory = get_memory()
+    memory.clear()
+    memory.enabled = args.memory
+    telemetry = get_telemetry()
+    telemetry.reset()
+
+    fake = FakeGemini(args.latency_ms, args.latency_sigma, args.error_rate, args.token_ratio, args.seed)
+    limiter = RateLimiter(args.requests_per_minute, args.tokens_per_minute)
+    model = StageTimer(RateLimitedModel(fake, limiter))
+    supabase = FakeSupabase(args.db_latency_ms)
+    ads = make_ads(batch_size, args.seed)
+    countries = make_countries(args.countries)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    completed, failed = SCENARIOS[name](ads, countries, model, supabase, args.workers)
+    elapsed = time.perf_counter() - started
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stages = dict(model.latencies, insert=supabase.request_seconds)
+    limiter_stats = limiter.get_stats()
+    return {
+        'scenario': name,
+        'batch_size': batch_size,
+        'tasks': len(ads) * len(countries),
+        'completed': completed,
+        'failed': failed,
+        'seconds': elapsed,
+        'tasks_per_sec': completed / elapsed if elapsed else 0.0,
+        'latency_ms': {
+            stage: {p: percentile(values, int(p[1:])) * 1000 for p in ('p50', 'p95', 'p99')}
+            for stage, values in stages.items()
+        },
+        'calls': {
+            'model': fake.calls,
+            'translate': len(model.latencies['translate']),
+            'proofread': len(model.latencies['proofread']),
+            'retries': limiter_stats['retries'],
+            'model_errors': fake.errors,
+            'db_requests': supabase.requests
+        },
+        'cost_usd': sum(row['cost'] for row in telemetry.summary('stage')),
+        'peak_memory_kb': peak_memory / 1024
+    }
+
+def print_results(results):
+    print(f"{'scenario':<8} {'batch':>6} {'tasks/s':>9} {'calls':>6} {'db':>5} {'mem KB':>9}  p50/p95/p99 ms (translate | proofread | insert)")
+    for r in results:
+        stages = ' | '.join(
+            '/'.join(f"{r['latency_ms'][stage][p]:.0f}" for p in ('p50', 'p95', 'p99'))
+            for stage in ('translate', 'proofread', 'insert')
+        )
+        print(f"{r['scenario']:<8} {r['batch_size']:>6} {r['tasks_per_sec']:>9.1f} {r['calls']['model']:>6} "
+              f"{r['calls']['db_requests']:>5} {r['peak_memory_kb']:>9.0f}  {stages}")
+
+def find_regressions(results, baseline, max_regression):
+    """Scenarios whose tasks/sec fell more than max_regression below the baseline"""
+    previous = {(r['scenario'], r['batch_size']): r['tasks_per_sec'] for r in baseline}
+    regressions = []
+    for r in results:
+        before = previous.get((r['scenario'], r['batch_size']))
+        if before and r['tasks_per_sec'] < before * (1 - max_regression):
+            regressions.append(f"{r['scenario']} x{r['batch_size']}: {r['tasks_per_sec']:.1f} tasks/s vs {before:.1f} baseline")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-sizes', default='10,50,200', help="Comma-separated numbers of ads per run")
+    parser.add_argument('--scenarios', default='bulk,text')
+    parser.add_argument('--countries', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--latency-ms', type=float, default=20, help="Median fake model latency")
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help="Log-normal spread of the model latency")
+    parser.add_argument('--error-rate', type=float, default=0.02, help="Share of model calls failing with a retryable 503")
+    parser.add_argument('--token-ratio', type=float, default=2.0, help="Reported tokens per prompt token")
+    parser.add_argument('--db-latency-ms', type=float, default=5)
+    parser.add_argument('--requests-per-minute', type=int, default=gemini_client.REQUESTS_PER_MINUTE)
+    parser.add_argument('--tokens-per-minute', type=int, default=gemini_client.TOKENS_PER_MINUTE)
+    parser.add_argument('--memory', action='store_true', help="Enable the translation memory")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the results as JSON")
+    parser.add_argument('--baseline', help="Results JSON from an earlier run to compare against")
+    parser.add_argument('--max-regression', type=float, default=0.2, help="Allowed tasks/sec drop against the baseline")
+    args = parser.parse_args(argv)
+
+    # Retry backoff is scaled to the fake latency, otherwise a few 503s dominate the run
+    gemini_client.BASE_BACKOFF_SECONDS = args.latency_ms / 1000
+
+    results = [
+        run_scenario(name, int(size), args)
+        for name in args.scenarios.split(',')
+        for size in args.batch_sizes.split(',')
+    ]
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
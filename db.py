@@ -0,0 +1,219 @@
+import os
+import time
+import threading
+
+def connect_supabase():
+    """Create a client from SUPABASE_URL and SUPABASE_KEY, for scripts running outside the UI"""
+    from supabase import create_client
+    return create_client(os.environ['SUPABASE_URL'], os.environ['SUPABASE_KEY'])
+
+# Count methods accepted by PostgREST: 'exact' runs count(*), 'planned' reads the
+# planner estimate, 'estimated' is exact for small tables and planned for big ones
+EXACT_COUNT = 'exact'
+ESTIMATED_COUNT = 'estimated'
+
+def count_rows(supabase, table, count=EXACT_COUNT):
+    """Count rows server-side with a head-only request"""
+    response = supabase.table(table).select('id', count=count, head=True).execute()
+    return response.count or 0
+
+# Rows per request when walking a whole table
+FETCH_BATCH_SIZE = 1000
+
+def fetch_all(supabase, table, columns='*', filters=None, batch_size=FETCH_BATCH_SIZE, after_id=None, minimums=None):
+    """Yield every matching row in id order, paging by id past the PostgREST row limit.
+
+    filters are equality filters and minimums are >= filters, both keyed by
+    column. after_id skips rows up to and including that id, e.g. to resume
+    a scan.
+    """
+    if columns != '*' and 'id' not in [c.strip() for c in columns.split(',')]:
+        columns = f'id,{columns}'
+    last_id = after_id
+    while True:
+        query = supabase.table(table).select(columns)
+        for name, value in (filters or {}).items():
+            query = query.eq(name, value)
+        for name, value in (minimums or {}).items():
+            query = query.gte(name, value)
+        if last_id is not None:
+            query = query.gt('id', last_id)
+        rows = query.order('id').limit(batch_size).execute().data
+        if not rows:
+            return
+        yield from rows
+        # A short page is the last one, no need to ask for an empty page
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1]['id']
+
+# Columns that order rows by when they last changed, in order of preference;
+# updated_at needs migrations/002_updated_at.sql, created_at only catches new rows
+WATERMARK_COLUMNS = ('updated_at', 'created_at')
+
+def find_watermark_column(supabase, table, candidates=WATERMARK_COLUMNS):
+    """The first candidate column that table has, or 'id' when it has none, so only new rows are found"""
+    for column in candidates:
+        try:
+            supabase.table(table).select(f'id,{column}').limit(1).execute()
+            return column
+        except Exception:
+            continue
+    return 'id'
+
+def fetch_changed(supabase, table, columns='*', watermark_column='id', position=None, batch_size=FETCH_BATCH_SIZE):
+    """Yield (rows, position) pages of rows changed after position, in (watermark, id) order.
+
+    position is the (watermark, id) of the last row already seen, as yielded
+    with the previous page, or None to start from the beginning. Pages are
+    keyset queries, so each costs one indexed request however far in the
+    table it is.
+    """
+    if columns != '*':
+        names = [c.strip() for c in columns.split(',')]
+        columns = ','.join(dict.fromkeys(['id', watermark_column] + names))
+    while True:
+        query = supabase.table(table).select(columns)
+        if watermark_column == 'id':
+            if position is not None:
+                query = query.gt('id', position[1])
+            query = query.order('id')
+        else:
+            if position is not None:
+                watermark, last_id = position
+                query = query.or_(f'{watermark_column}.gt."{watermark}",and({watermark_column}.eq."{watermark}",id.gt.{last_id})')
+            query = query.order(watermark_column).order('id')
+        rows = query.limit(batch_size).execute().data
+        if not rows:
+            return
+        position = (rows[-1][watermark_column], rows[-1]['id'])
+        yield rows, position
+        if len(rows) < batch_size:
+            return
+
+def fetch_column(supabase, table, column, filters=None):
+    """Fetch one column of every matching row"""
+    return [row[column] for row in fetch_all(supabase, table, column, filters)]
+
+def find_untranslated_ad_ids(supabase, ad_ids, country_code):
+    """Return the ad ids that have no translation for a country yet, in their original order"""
+    translated = set(fetch_column(supabase, 'translations', 'ad_copy_id', {'country_code': country_code}))
+    return [ad_id for ad_id in ad_ids if ad_id not in translated]
+
+DEFAULT_PAGE_SIZE = 20
+
+def fetch_page(query, page_size=DEFAULT_PAGE_SIZE, cursor=None):
+    """Fetch one page of a query, newest first, using keyset pagination.
+
+    cursor is the (created_at, id) of the last row of the previous page, or
+    None for the first page. Returns (rows, next_cursor) where next_cursor
+    is None on the last page.
+    """
+    if cursor:
+        created_at, row_id = cursor
+        query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{row_id})')
+
+    # Ask for one extra row to know whether another page exists
+    rows = query.order('created_at', desc=True).order('id', desc=True).limit(page_size + 1).execute().data
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = (rows[-1]['created_at'], rows[-1]['id'])
+    return rows, next_cursor
+
+# Rows per multi-row insert, and how long rows may wait in the buffer
+WRITE_BATCH_SIZE = 100
+WRITE_FLUSH_SECONDS = 5
+MAX_WRITE_ATTEMPTS = 3
+WRITE_RETRY_BACKOFF_SECONDS = 1
+
+class BatchWriter:
+    """Buffer rows for a table and write them with multi-row requests.
+
+    Rows are flushed when the buffer reaches batch_size, when flush_seconds
+    have passed since the last flush, and on close(). A failing chunk is
+    retried with backoff and then split in half, so one bad row does not sink
+    its neighbours and rows that were written are never sent twice. Rows that
+    still fail end up in failed_rows with the error in errors.
+
+    on_write(rows, error) is called after every chunk is written (error is
+    None) and for every row that finally fails, so callers can tell when
+    their rows are stored.
+    """
+
+    def __init__(self, supabase, table, batch_size=WRITE_BATCH_SIZE, flush_seconds=WRITE_FLUSH_SECONDS,
+                 max_attempts=MAX_WRITE_ATTEMPTS, on_conflict=None, on_write=None):
+        self.supabase = supabase
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_attempts = max_attempts
+        self.on_conflict = on_conflict
+        self.on_write = on_write
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.written = 0
+        self.requests = 0
+        self.failed_rows = []
+        self.errors = []
+        self.last_flush = time.monotonic()
+
+    def add(self, rows):
+        """Queue one row or a list of rows, flushing if a threshold is reached"""
+        if isinstance(rows, dict):
+            rows = [rows]
+        with self.lock:
+            self.buffer.extend(rows)
+            due = len(self.buffer) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_seconds
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far"""
+        with self.lock:
+            rows, self.buffer = self.buffer, []
+            self.last_flush = time.monotonic()
+        for start in range(0, len(rows), self.batch_size):
+            self._write_chunk(rows[start:start + self.batch_size], self.max_attempts)
+
+    def close(self):
+        self.flush()
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write_chunk(self, chunk, attempts):
+        error = None
+        for attempt in range(attempts):
+            if attempt:
+                time.sleep(WRITE_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+            try:
+                table = self.supabase.table(self.table)
+                query = table.upsert(chunk, on_conflict=self.on_conflict) if self.on_conflict else table.insert(chunk)
+                query.execute()
+                with self.lock:
+                    self.written += len(chunk)
+                    self.requests += 1
+                if self.on_write:
+                    self.on_write(chunk, None)
+                return
+            except Exception as e:
+                error = e
+                with self.lock:
+                    self.requests += 1
+
+        # Isolate the rows that keep failing, halves get a single attempt each
+        if len(chunk) > 1:
+            middle = len(chunk) // 2
+            self._write_chunk(chunk[:middle], 1)
+            self._write_chunk(chunk[middle:], 1)
+            return
+        with self.lock:
+            self.failed_rows.extend(chunk)
+            self.errors.append(str(error))
+        if self.on_write:
+            self.on_write(chunk, str(error))
@@ -0,0 +1,141 @@
+"""Stream translations out of Supabase as CSV, JSONL or ad platform bulk-upload layouts.
+
+Translations are read in keyset pages and joined page by page with their
+ad copies, and every row is written as soon as it is read, so memory use
+does not grow with the size of the export. Also usable from the shell:
+
+    python export.py --format meta --country FR --min-quality 80 --output meta_fr.csv
+"""
+import os
+import csv
+import sys
+import json
+import argparse
+import itertools
+
+from db import connect_supabase, fetch_all, FETCH_BATCH_SIZE
+from translator import AD_FIELDS
+
+# Server-side folder for exports made from the UI
+EXPORT_DIR = os.environ.get('EXPORT_DIR', 'exports')
+
+TRANSLATION_COLUMNS = ['id', 'ad_copy_id', 'country_code', 'language'] + AD_FIELDS + ['quality_score']
+
+def _label(row):
+    return f"Ad {row['ad_copy_id']} - {row['country_code']}"
+
+# Column layouts of the platforms' bulk upload sheets, filled from a joined row
+PLATFORM_LAYOUTS = {
+    'google_ads': {
+        'Ad group': _label,
+        'Headline 1': lambda row: row['headline'],
+        'Headline 2': lambda row: row['product'],
+        'Description 1': lambda row: row['body'],
+        'Language': lambda row: row['language'],
+        'Label': lambda row: row['country_code'],
+    },
+    'meta': {
+        'Ad Name': _label,
+        'Title': lambda row: row['headline'],
+        'Body': lambda row: row['body'],
+        'Link Description': lambda row: row['product'],
+        'Call to Action Text': lambda row: row['link_text'],
+        'Language': lambda row: row['language'],
+    },
+    'tiktok': {
+        'Ad name': _label,
+        'Ad text': lambda row: row['body'],
+        'Call to action': lambda row: row['link_text'],
+        'Language': lambda row: row['language'],
+    },
+}
+
+EXPORT_FORMATS = {
+    'csv': "CSV (all fields)",
+    'jsonl': "JSON Lines (all fields)",
+    'google_ads': "Google Ads Editor CSV",
+    'meta': "Meta Ads Manager CSV",
+    'tiktok': "TikTok Ads Manager CSV",
+}
+
+def export_extension(fmt):
+    return 'jsonl' if fmt == 'jsonl' else 'csv'
+
+def export_rows(supabase, country_code=None, ad_copy_id=None, min_quality=0, batch_size=FETCH_BATCH_SIZE):
+    """Yield translations matching the library filters, each with its ad copy's fields as source_<field>"""
+    filters = {}
+    if country_code:
+        filters['country_code'] = country_code
+    if ad_copy_id:
+        filters['ad_copy_id'] = ad_copy_id
+    rows = fetch_all(supabase, 'translations', ','.join(TRANSLATION_COLUMNS), filters, batch_size, minimums={'quality_score': min_quality})
+
+    while True:
+        page = list(itertools.islice(rows, batch_size))
+        if not page:
+            return
+        ad_ids = list({row['ad_copy_id'] for row in page})
+        ads = supabase.table('ad_copies').select('id,' + ','.join(AD_FIELDS)).in_('id', ad_ids).execute().data
+        ads_by_id = {ad['id']: ad for ad in ads}
+        for row in page:
+            ad = ads_by_id.get(row['ad_copy_id'], {})
+            for name in AD_FIELDS:
+                row[name] = row.get(name) or ''
+                row[f'source_{name}'] = ad.get(name) or ''
+            yield row
+
+def write_export(rows, fmt, file):
+    """Write rows to an open text file in the given format and return how many were written"""
+    count = 0
+    if fmt == 'jsonl':
+        for row in rows:
+            file.write(json.dumps(row, ensure_ascii=False) + '\n')
+            count += 1
+        return count
+
+    if fmt == 'csv':
+        columns = TRANSLATION_COLUMNS + [f'source_{name}' for name in AD_FIELDS]
+        convert = lambda row: row
+    else:
+        layout = PLATFORM_LAYOUTS[fmt]
+        columns = list(layout)
+        convert = lambda row: {column: value(row) for column, value in layout.items()}
+
+    writer = csv.DictWriter(file, fieldnames=columns, extrasaction='ignore')
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(convert(row))
+        count += 1
+    return count
+
+def export_to_file(supabase, path, fmt, **filters):
+    """Export the filtered translations to path, returning the row count"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        return write_export(export_rows(supabase, **filters), fmt, f)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export translations for ad platforms")
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+    parser.add_argument('--country', help="Only this country code")
+    parser.add_argument('--ad-id', type=int, help="Only this ad copy")
+    parser.add_argument('--min-quality', type=int, default=0)
+    parser.add_argument('--output', help="File to write, stdout by default")
+    args = parser.parse_args(argv)
+
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    rows = export_rows(connect_supabase(), args.country, args.ad_id, args.min_quality)
+    if args.output:
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            count = write_export(rows, args.format, f)
+    else:
+        count = write_export(rows, args.format, sys.stdout)
+    print(f"Exported {count} translations", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,250 @@
+import time
+import random
+import threading
+
+from telemetry import get_telemetry
+
+DEFAULT_MODEL = 'gemini-2.5-flash'
+
+# Per-minute quota shared by every model call in the process, set to the project's Gemini limits
+REQUESTS_PER_MINUTE = 1000
+TOKENS_PER_MINUTE = 1_000_000
+
+REQUEST_TIMEOUT_SECONDS = 60
+MAX_RETRIES = 5
+BASE_BACKOFF_SECONDS = 1
+MAX_BACKOFF_SECONDS = 60
+
+# In-flight calls: grows by one after a run of successes, halves on throttling
+INITIAL_CONCURRENCY = 4
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 16
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+THROTTLED_ERRORS = {'ResourceExhausted', 'TooManyRequests'}
+RETRYABLE_ERRORS = THROTTLED_ERRORS | {'ServiceUnavailable', 'InternalServerError', 'DeadlineExceeded', 'BadGateway', 'GatewayTimeout'}
+
+def estimate_tokens(text):
+    """Rough token count, about four characters per token"""
+    return max(1, len(text) // 4)
+
+def _status_code(error):
+    code = getattr(error, 'code', None)
+    return code if isinstance(code, int) else None
+
+def is_throttled(error):
+    return _status_code(error) == 429 or type(error).__name__ in THROTTLED_ERRORS
+
+def is_retryable(error):
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return _status_code(error) in RETRYABLE_STATUS_CODES or type(error).__name__ in RETRYABLE_ERRORS
+
+def backoff_seconds(attempt):
+    """Full-jitter exponential backoff for the given retry attempt (0-based)"""
+    return random.uniform(0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** attempt))
+
+class TokenBucket:
+    """Refills rate_per_minute units per minute, up to one minute's worth"""
+
+    def __init__(self, rate_per_minute):
+        self.capacity = rate_per_minute
+        self.tokens = rate_per_minute
+        self.refill_per_second = rate_per_minute / 60
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        """Block until amount units are available and take them"""
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.refill_per_second
+            time.sleep(wait)
+
+    def charge(self, amount):
+        """Take units without waiting, e.g. when actual usage beat the estimate"""
+        with self.lock:
+            self._refill()
+            self.tokens -= amount
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+class AdaptiveConcurrency:
+    """AIMD cap on in-flight calls"""
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, minimum=MIN_CONCURRENCY, maximum=MAX_CONCURRENCY):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.successes = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, throttled=False):
+        with self.condition:
+            self.in_flight -= 1
+            if throttled:
+                # Multiplicative decrease
+                self.limit = max(self.minimum, self.limit / 2)
+                self.successes = 0
+            else:
+                # Additive increase once a full window of calls succeeded
+                self.successes += 1
+                if self.successes >= int(self.limit):
+                    self.limit = min(self.maximum, self.limit + 1)
+                    self.successes = 0
+            self.condition.notify_all()
+
+class RateLimiter:
+    """Request and token budgets plus adaptive concurrency, shared by all model wrappers"""
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.concurrency = AdaptiveConcurrency()
+        self.lock = threading.Lock()
+        self.stats = {'calls': 0, 'retries': 0, 'throttled': 0, 'errors': 0}
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats['concurrency_limit'] = int(self.concurrency.limit)
+        return stats
+
+class RateLimitedModel:
+    """Wraps a GenerativeModel so every generate_content call is budgeted and retried.
+
+    Calls wait for the request and token buckets, run under the adaptive
+    concurrency cap and are retried with jittered exponential backoff on
+    429s, 5xx errors and timeouts. Anything else is raised straight away.
+
+    With stream=True a generator of response chunks is returned instead.
+    It holds its concurrency slot until the stream ends or is closed, and
+    is only retried if it fails before the first chunk.
+
+    Every call is recorded in telemetry under the labels set by the caller,
+    with its duration including retries and the usage_metadata token counts.
+    """
+
+    def __init__(self, model, limiter=None):
+        self.model = model
+        self.limiter = limiter or get_rate_limiter()
+
+    def generate_content(self, prompt, **kwargs):
+        limiter = self.limiter
+        # Output is usually about as long as the text being translated
+        estimated_tokens = estimate_tokens(prompt) * 2
+        kwargs.setdefault('request_options', {'timeout': REQUEST_TIMEOUT_SECONDS})
+        if kwargs.get('stream'):
+            return self._stream_content(prompt, estimated_tokens, **kwargs)
+
+        started = time.perf_counter()
+        for attempt in range(MAX_RETRIES + 1):
+            limiter.requests.acquire()
+            limiter.tokens.acquire(estimated_tokens)
+            limiter.concurrency.acquire()
+            try:
+                response = self.model.generate_content(prompt, **kwargs)
+            except Exception as e:
+                throttled = is_throttled(e)
+                limiter.concurrency.release(throttled)
+                if throttled:
+                    limiter.count('throttled')
+                if not is_retryable(e) or attempt == MAX_RETRIES:
+                    limiter.count('errors')
+                    get_telemetry().record_call(time.perf_counter() - started, retries=attempt, error=True)
+                    raise
+                limiter.count('retries')
+                time.sleep(backoff_seconds(attempt))
+                continue
+
+            limiter.concurrency.release()
+            self._finish(getattr(response, 'usage_metadata', None), estimated_tokens, started, attempt)
+            return response
+
+    def _stream_content(self, prompt, estimated_tokens, **kwargs):
+        limiter = self.limiter
+        call_started = time.perf_counter()
+        for attempt in range(MAX_RETRIES + 1):
+            limiter.requests.acquire()
+            limiter.tokens.acquire(estimated_tokens)
+            limiter.concurrency.acquire()
+            started = False
+            usage = None
+            error = None
+            try:
+                for chunk in self.model.generate_content(prompt, **kwargs):
+                    started = True
+                    usage = getattr(chunk, 'usage_metadata', None) or usage
+                    yield chunk
+            except Exception as e:
+                error = e
+            finally:
+                # Also runs when the caller closes the stream early
+                limiter.concurrency.release(error is not None and is_throttled(error))
+
+            if error is None:
+                self._finish(usage, estimated_tokens, call_started, attempt)
+                return
+            if is_throttled(error):
+                limiter.count('throttled')
+            if started or not is_retryable(error) or attempt == MAX_RETRIES:
+                limiter.count('errors')
+                get_telemetry().record_call(time.perf_counter() - call_started, retries=attempt, error=True)
+                raise error
+            limiter.count('retries')
+            time.sleep(backoff_seconds(attempt))
+
+    def _finish(self, usage, estimated_tokens, started, retries):
+        """Count a successful call, charge tokens beyond the estimate and record telemetry"""
+        self.limiter.count('calls')
+        total_tokens = getattr(usage, 'total_token_count', 0) if usage else 0
+        if total_tokens > estimated_tokens:
+            self.limiter.tokens.charge(total_tokens - estimated_tokens)
+        get_telemetry().record_call(
+            time.perf_counter() - started,
+            prompt_tokens=getattr(usage, 'prompt_token_count', 0) or 0,
+            output_tokens=getattr(usage, 'candidates_token_count', 0) or 0,
+            retries=retries
+        )
+
+    def __getattr__(self, name):
+        # Only called for attributes the wrapper lacks, e.g. model_name
+        if name == 'model':
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+def get_rate_limiter():
+    """Return the process-wide rate limiter, creating it on first use"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
+
+def create_model(api_key, model_name=DEFAULT_MODEL):
+    """Configure the Gemini SDK and return a rate-limited model"""
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    return RateLimitedModel(genai.GenerativeModel(model_name))
@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from db import BatchWriter
+from translator import (
+    translate_ad_to_countries, refresh_translation, run_concurrently,
+    plan_unique_translations, translate_unit, DEFAULT_MAX_WORKERS
+)
+
+# Jobs and their task lists are kept next to the app unless overridden
+DEFAULT_JOBS_PATH = os.environ.get('TRANSLATION_JOBS_PATH', '.translation_jobs.sqlite3')
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+def make_task(ad, countries, translation=None):
+    """A job task: translate ad into countries, or refresh an existing translations row"""
+    task = {'ad': ad, 'countries': countries}
+    if translation is not None:
+        task['translation'] = translation
+    return task
+
+def run_task(task, model, known=None):
+    """Run one job task and return the translations rows it produced.
+
+    known holds translations already made for the job's unique strings.
+    """
+    if 'translation' in task:
+        return [refresh_translation(task['ad'], task['translation'], task['countries'][0], model)]
+    return translate_ad_to_countries(task['ad'], task['countries'], model, known=known)
+
+class JobStore:
+    """SQLite record of translation jobs and their tasks.
+
+    Each task (see make_task) is stored as JSON together with its weight,
+    the number of ad/country pairs it covers, so progress survives reruns
+    and restarts.
+    """
+
+    def __init__(self, path=DEFAULT_JOBS_PATH):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT,
+                description TEXT,
+                status TEXT,
+                total INTEGER,
+                completed INTEGER DEFAULT 0,
+                failed INTEGER DEFAULT 0,
+                error TEXT,
+                unique_strings INTEGER,
+                total_strings INTEGER,
+                created_at REAL,
+                started_at REAL,
+                finished_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS job_tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id INTEGER,
+                payload TEXT,
+                weight INTEGER,
+                status TEXT DEFAULT 'pending',
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_job_tasks_job ON job_tasks (job_id, status);
+        """)
+        # Job files created before deduplication lack the string counters
+        columns = {row['name'] for row in self.db.execute("PRAGMA table_info(jobs)")}
+        for column in ('unique_strings', 'total_strings'):
+            if column not in columns:
+                self.db.execute(f"ALTER TABLE jobs ADD COLUMN {column} INTEGER")
+        self.db.commit()
+
+    def create_job(self, kind, description, tasks):
+        """Store a job with its tasks and return its id"""
+        with self.lock:
+            cursor = self.db.execute(
+                "INSERT INTO jobs (kind, description, status, total, created_at) VALUES (?, ?, 'queued', ?, ?)",
+                (kind, description, sum(len(task['countries']) for task in tasks), time.time())
+            )
+            job_id = cursor.lastrowid
+            self.db.executemany(
+                "INSERT INTO job_tasks (job_id, payload, weight) VALUES (?, ?, ?)",
+                [(job_id, json.dumps(task), len(task['countries'])) for task in tasks]
+            )
+            self.db.commit()
+            return job_id
+
+    def pending_tasks(self, job_id):
+        """Return [(task_id, payload)] for tasks that have not run yet"""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT id, payload FROM job_tasks WHERE job_id = ? AND status = 'pending' ORDER BY id", (job_id,)
+            ).fetchall()
+        return [(row['id'], json.loads(row['payload'])) for row in rows]
+
+    def mark_started(self, job_id):
+        with self.lock:
+            self.db.execute(
+                "UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, ?), finished_at = NULL WHERE id = ?",
+                (time.time(), job_id)
+            )
+            self.db.commit()
+
+    def finish_task(self, job_id, task_id, weight, error=None):
+        """Record a task outcome and bump the job counters"""
+        with self.lock:
+            self.db.execute(
+                "UPDATE job_tasks SET status = ?, error = ? WHERE id = ?",
+                ('failed' if error else 'done', error, task_id)
+            )
+            column = 'failed' if error else 'completed'
+            self.db.execute(f"UPDATE jobs SET {column} = {column} + ? WHERE id = ?", (weight, job_id))
+            self.db.commit()
+
+    def set_string_counts(self, job_id, unique, total):
+        """Record how many distinct strings the job's pending tasks needed out of all their strings"""
+        with self.lock:
+            self.db.execute("UPDATE jobs SET unique_strings = ?, total_strings = ? WHERE id = ?", (unique, total, job_id))
+            self.db.commit()
+
+    def finish_job(self, job_id, status, error=None):
+        with self.lock:
+            self.db.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id)
+            )
+            self.db.commit()
+
+    def get_job(self, job_id):
+        with self.lock:
+            row = self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_jobs(self, limit=10):
+        """Most recent jobs first"""
+        with self.lock:
+            rows = self.db.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def task_errors(self, job_id, limit=20):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT payload, error FROM job_tasks WHERE job_id = ? AND status = 'failed' ORDER BY id LIMIT ?",
+                (job_id, limit)
+            ).fetchall()
+        return [(json.loads(row['payload'])['ad']['id'], row['error']) for row in rows]
+
+class JobManager:
+    """Runs stored jobs on background threads that outlive the Streamlit script run.
+
+    Before its tasks run, a job translates each distinct (text, country)
+    pair among them once, so strings repeated across ads cost one call.
+    A job whose status is still active but has no live thread (for example
+    after a server restart) is reported as interrupted and can be resumed
+    with fresh clients; only its pending tasks run again.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or JobStore()
+        self.lock = threading.Lock()
+        self.threads = {}
+        self.cancel_events = {}
+
+    def enqueue(self, kind, description, tasks, supabase, model, max_workers=DEFAULT_MAX_WORKERS):
+        """Store a job and start working on it, returning the job id"""
+        job_id = self.store.create_job(kind, description, tasks)
+        self.start(job_id, supabase, model, max_workers)
+        return job_id
+
+    def start(self, job_id, supabase, model, max_workers=DEFAULT_MAX_WORKERS):
+        """Start (or resume) a job on a background thread"""
+        with self.lock:
+            if self.is_alive(job_id):
+                return
+            cancel_event = threading.Event()
+            thread = threading.Thread(
+                target=self._run,
+                args=(job_id, supabase, model, max_workers, cancel_event),
+                name=f"translation-job-{job_id}",
+                daemon=True
+            )
+            self.threads[job_id] = thread
+            self.cancel_events[job_id] = cancel_event
+            thread.start()
+
+    def cancel(self, job_id):
+        """Stop a job after the tasks already in flight finish"""
+        with self.lock:
+            cancel_event = self.cancel_events.get(job_id)
+            alive = self.is_alive(job_id)
+        if alive:
+            cancel_event.set()
+        else:
+            self.store.finish_job(job_id, 'cancelled')
+
+    def is_alive(self, job_id):
+        thread = self.threads.get(job_id)
+        return thread is not None and thread.is_alive()
+
+    def list_jobs(self, limit=10):
+        """Recent jobs with derived status and ETA"""
+        jobs = self.store.list_jobs(limit)
+        for job in jobs:
+            if job['status'] in ACTIVE_STATUSES and not self.is_alive(job['id']):
+                job['status'] = 'interrupted'
+            job['eta_seconds'] = self._eta(job)
+        return jobs
+
+    def has_active_jobs(self):
+        with self.lock:
+            return any(thread.is_alive() for thread in self.threads.values())
+
+    def _eta(self, job):
+        processed = job['completed'] + job['failed']
+        if job['status'] != 'running' or not job['started_at'] or not processed:
+            return None
+        rate = processed / max(time.time() - job['started_at'], 1e-6)
+        return (job['total'] - processed) / rate
+
+    def _run(self, job_id, supabase, model, max_workers, cancel_event):
+        self.store.mark_started(job_id)
+        # Refresh jobs rewrite existing rows, so they upsert on id
+        on_conflict = 'id' if self.store.get_job(job_id)['kind'] == 'refresh' else None
+        # A task is finished only once every one of its rows is written or has failed,
+        # so rows still buffered when the server stops are redone on resume
+        unsaved = {}
+        row_tasks = {}
+
+        def rows_written(rows, error):
+            for row in rows:
+                task_id = row_tasks.pop(id(row))
+                task = unsaved[task_id]
+                task['rows'] -= 1
+                task['error'] = task['error'] or error
+                if not task['rows']:
+                    del unsaved[task_id]
+                    self.store.finish_task(job_id, task_id, task['weight'], task['error'] and f"Could not save: {task['error']}")
+
+        writer = BatchWriter(supabase, 'translations', on_conflict=on_conflict, on_write=rows_written)
+
+        try:
+            tasks = self.store.pending_tasks(job_id)
+            known = self._translate_unique(job_id, tasks, model, max_workers, cancel_event)
+            if cancel_event.is_set():
+                tasks = []
+            results = run_concurrently(lambda task: run_task(task[1], model, known), tasks, max_workers)
+            for (task_id, payload), rows, error in results:
+                if error:
+                    self.store.finish_task(job_id, task_id, len(payload['countries']), str(error))
+                elif not rows:
+                    self.store.finish_task(job_id, task_id, len(payload['countries']))
+                else:
+                    unsaved[task_id] = {'rows': len(rows), 'weight': len(payload['countries']), 'error': None}
+                    row_tasks.update((id(row), task_id) for row in rows)
+                    writer.add(rows)
+                if cancel_event.is_set():
+                    # Closing the generator drops the queued tasks
+                    results.close()
+                    break
+
+            writer.close()
+            error = None
+            if writer.failed_rows:
+                error = f"{len(writer.failed_rows)} translations could not be saved: {writer.errors[-1]}"
+            self.store.finish_job(job_id, 'cancelled' if cancel_event.is_set() else 'completed', error)
+        except Exception as e:
+            writer.close()
+            self.store.finish_job(job_id, 'failed', str(e))
+
+    def _translate_unique(self, job_id, tasks, model, max_workers, cancel_event):
+        """Translate the distinct strings of the new-translation tasks, returning {(country_code, text): translation}"""
+        units, total = plan_unique_translations(
+            [(payload['ad'], payload['countries']) for _, payload in tasks if 'translation' not in payload]
+        )
+        known = {}
+        if not total:
+            return known
+        self.store.set_string_counts(job_id, sum(len(countries) * len(texts) for countries, texts in units), total)
+
+        results = run_concurrently(lambda unit: translate_unit(unit, model), units, max_workers)
+        for _, translated, _ in results:
+            # A failed unit is not fatal, the tasks translate those strings themselves
+            if translated:
+                known.update(translated)
+            if cancel_event.is_set():
+                results.close()
+                break
+        return known
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_job_manager():
+    """Return the process-wide job manager, creating it on first use"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
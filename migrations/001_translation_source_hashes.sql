@@ -0,0 +1,4 @@
+-- Fingerprint of each source field a translation was made from, used to
+-- re-translate only the fields that changed when an ad copy is edited.
+-- Rows without it are treated as stale in every field.
+alter table translations add column if not exists source_hashes jsonb;
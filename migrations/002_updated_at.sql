@@ -0,0 +1,24 @@
+-- Last-modified timestamps, used as the sync watermark of the local replica
+-- so edits made outside the app (or by background jobs) reach it too.
+-- Without them the replica syncs by created_at and only sees new rows.
+create or replace function set_updated_at() returns trigger as $$
+begin
+    new.updated_at = now();
+    return new;
+end;
+$$ language plpgsql;
+
+alter table ad_copies add column if not exists updated_at timestamptz not null default now();
+alter table translations add column if not exists updated_at timestamptz not null default now();
+alter table country_prompts add column if not exists updated_at timestamptz not null default now();
+
+drop trigger if exists ad_copies_updated_at on ad_copies;
+create trigger ad_copies_updated_at before update on ad_copies for each row execute function set_updated_at();
+drop trigger if exists translations_updated_at on translations;
+create trigger translations_updated_at before update on translations for each row execute function set_updated_at();
+drop trigger if exists country_prompts_updated_at on country_prompts;
+create trigger country_prompts_updated_at before update on country_prompts for each row execute function set_updated_at();
+
+create index if not exists idx_ad_copies_updated_at on ad_copies (updated_at, id);
+create index if not exists idx_translations_updated_at on translations (updated_at, id);
+create index if not exists idx_country_prompts_updated_at on country_prompts (updated_at, id);
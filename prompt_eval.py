@@ -0,0 +1,67 @@
+import time
+import random
+import statistics
+
+from db import fetch_column
+from translator import _translate_text, proofread_translation, run_concurrently, DEFAULT_MAX_WORKERS
+from telemetry import call_labels
+
+def sample_ad_texts(supabase, size, seed=None):
+    """Bodies of up to size randomly chosen ad copies"""
+    ad_ids = fetch_column(supabase, 'ad_copies', 'id')
+    chosen = random.Random(seed).sample(ad_ids, min(size, len(ad_ids)))
+    if not chosen:
+        return []
+    ads = supabase.table('ad_copies').select('id, body').in_('id', chosen).execute()
+    return [ad['body'] for ad in ads.data if ad.get('body')]
+
+def _run_trial(trial, language, model, country_code=''):
+    _, variant, text = trial
+    started = time.perf_counter()
+    with call_labels(country=country_code):
+        # Straight to the model: translation memory reuse would hand every variant the same text
+        translated = _translate_text(text, language, variant['user_prompt'], variant['system_prompt'], model)
+        score, _, _ = proofread_translation(text, translated, language, model)
+    return float(score), time.perf_counter() - started
+
+def summarize(scores, latencies, errors):
+    """Score and latency statistics for one variant"""
+    summary = {'trials': len(scores), 'errors': errors}
+    if scores:
+        summary.update({
+            'mean_score': statistics.mean(scores),
+            'median_score': statistics.median(scores),
+            'stdev_score': statistics.pstdev(scores),
+            'min_score': min(scores),
+            'max_score': max(scores),
+            'mean_latency': statistics.mean(latencies),
+            'max_latency': max(latencies)
+        })
+    return summary
+
+def evaluate_prompts(variants, texts, language, model, max_workers=DEFAULT_MAX_WORKERS, on_progress=None, country_code=''):
+    """Translate and proofread every text with every prompt variant.
+
+    variants are dicts with system_prompt and user_prompt. All
+    len(variants) x len(texts) trials run on a bounded thread pool, and
+    on_progress(done, total) is called from the caller's thread after each
+    one. Calls are labelled with country_code in the usage telemetry.
+    Returns one summarize() dict per variant, in variant order.
+    """
+    trials = [(i, variant, text) for i, variant in enumerate(variants) for text in texts]
+    scores = [[] for _ in variants]
+    latencies = [[] for _ in variants]
+    errors = [0 for _ in variants]
+
+    done = 0
+    for (variant_index, _, _), result, error in run_concurrently(lambda trial: _run_trial(trial, language, model, country_code), trials, max_workers):
+        if error:
+            errors[variant_index] += 1
+        else:
+            scores[variant_index].append(result[0])
+            latencies[variant_index].append(result[1])
+        done += 1
+        if on_progress:
+            on_progress(done, len(trials))
+
+    return [summarize(scores[i], latencies[i], errors[i]) for i in range(len(variants))]
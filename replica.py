@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+from db import WATERMARK_COLUMNS, fetch_changed, find_watermark_column
+
+# Replica files live next to the app unless overridden, one per Supabase project
+DEFAULT_REPLICA_PATH = os.environ.get('LOCAL_REPLICA_PATH', '.supabase_replica.sqlite3')
+
+# Replicated tables and the columns kept in their own indexed SQLite columns;
+# every row is also stored whole as JSON
+REPLICATED_TABLES = {
+    'ad_copies': [],
+    'country_prompts': ['country_code'],
+    'translations': ['ad_copy_id', 'country_code', 'quality_score'],
+}
+
+SYNC_INTERVAL_SECONDS = 10
+SYNC_BATCH_SIZE = 1000
+
+class LocalReplica:
+    """SQLite copy of ad_copies, country_prompts and translations for fast local reads.
+
+    Tables are synced incrementally: each sync asks Supabase only for rows
+    past the stored (watermark, id) position, ordered by updated_at when
+    the column exists and by created_at otherwise. The app writes to
+    Supabase as before and then reports the change with update(), delete()
+    or mark_dirty(), so its own edits show up locally straight away.
+    Deletions made elsewhere are only picked up by resync().
+    """
+
+    def __init__(self, path=DEFAULT_REPLICA_PATH):
+        self.lock = threading.Lock()
+        self.dirty = set(REPLICATED_TABLES)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS sync_state (
+            table_name TEXT PRIMARY KEY,
+            watermark_column TEXT,
+            watermark TEXT,
+            last_id INTEGER,
+            synced_at REAL
+        )""")
+        for table, columns in REPLICATED_TABLES.items():
+            extra = ''.join(f", {column}" for column in columns)
+            self.db.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, created_at TEXT{extra}, data TEXT)")
+            self.db.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_created ON {table} (created_at, id)")
+            for column in columns:
+                self.db.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ({column})")
+        self.db.commit()
+
+    def sync(self, supabase, table, force=False):
+        """Pull rows changed since the last sync, at most every SYNC_INTERVAL_SECONDS unless forced or dirty"""
+        with self.lock:
+            state = self.db.execute(
+                "SELECT watermark_column, watermark, last_id, synced_at FROM sync_state WHERE table_name = ?", (table,)
+            ).fetchone()
+            column, watermark, last_id, synced_at = state or (None, None, None, 0)
+            if not force and table not in self.dirty and time.time() - synced_at < SYNC_INTERVAL_SECONDS:
+                return 0
+            self.dirty.discard(table)
+
+        if column is None:
+            column = find_watermark_column(supabase, table)
+            if column == 'id':
+                raise RuntimeError(f"{table} has none of the watermark columns {', '.join(WATERMARK_COLUMNS)}")
+
+        pulled = 0
+        position = (watermark, last_id) if watermark is not None else None
+        for rows, position in fetch_changed(supabase, table, '*', column, position, SYNC_BATCH_SIZE):
+            pulled += len(rows)
+            with self.lock:
+                self._store(table, rows)
+                self._save_state(table, column, position)
+                self.db.commit()
+        with self.lock:
+            self._save_state(table, column, position or (None, None))
+            self.db.commit()
+        return pulled
+
+    def sync_all(self, supabase, force=False):
+        return sum(self.sync(supabase, table, force) for table in REPLICATED_TABLES)
+
+    def resync(self, supabase):
+        """Drop the local copy and pull every table again, e.g. after deletions outside the app"""
+        with self.lock:
+            for table in REPLICATED_TABLES:
+                self.db.execute(f"DELETE FROM {table}")
+            self.db.execute("DELETE FROM sync_state")
+            self.db.commit()
+        return self.sync_all(supabase, force=True)
+
+    def mark_dirty(self, table):
+        """Sync table on its next read, e.g. after inserting rows into it"""
+        with self.lock:
+            self.dirty.add(table)
+
+    def update(self, table, row_id, changes):
+        """Apply an update already written to Supabase"""
+        with self.lock:
+            row = self.db.execute(f"SELECT data FROM {table} WHERE id = ?", (row_id,)).fetchone()
+            if row:
+                self._store(table, [{**json.loads(row[0]), **changes}])
+                self.db.commit()
+
+    def delete(self, table, row_id):
+        """Apply a delete already made in Supabase"""
+        with self.lock:
+            self.db.execute(f"DELETE FROM {table} WHERE id = ?", (row_id,))
+            self.db.commit()
+
+    def rows(self, table):
+        """Every row of a table in id order"""
+        with self.lock:
+            return [json.loads(data) for (data,) in self.db.execute(f"SELECT data FROM {table} ORDER BY id")]
+
+    def rows_by_id(self, table, ids):
+        """The rows of a table with the given ids, in no particular order"""
+        if not ids:
+            return []
+        with self.lock:
+            return [json.loads(data) for (data,) in self.db.execute(
+                f"SELECT data FROM {table} WHERE id IN ({', '.join('?' * len(ids))})", list(ids)
+            )]
+
+    def count(self, table):
+        with self.lock:
+            return self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def translations_page(self, filters, page_size, cursor=None):
+        """Library page with the same contract as db.fetch_page, filters holding country_code, ad_copy_id and min_quality"""
+        where = ["quality_score >= ?"]
+        params = [filters.get('min_quality', 0)]
+        for column in ('country_code', 'ad_copy_id'):
+            if filters.get(column) is not None:
+                where.append(f"{column} = ?")
+                params.append(filters[column])
+        if cursor:
+            where.append("(created_at < ? OR (created_at = ? AND id < ?))")
+            params += [cursor[0], cursor[0], cursor[1]]
+
+        with self.lock:
+            rows = [json.loads(data) for (data,) in self.db.execute(
+                f"SELECT data FROM translations WHERE {' AND '.join(where)} ORDER BY created_at DESC, id DESC LIMIT ?",
+                params + [page_size + 1]
+            )]
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = (rows[-1]['created_at'], rows[-1]['id'])
+        return rows, next_cursor
+
+    def last_synced(self):
+        with self.lock:
+            row = self.db.execute("SELECT MIN(synced_at) FROM sync_state").fetchone()
+        return row[0]
+
+    def _save_state(self, table, column, position):
+        self.db.execute(
+            "INSERT OR REPLACE INTO sync_state (table_name, watermark_column, watermark, last_id, synced_at) VALUES (?, ?, ?, ?, ?)",
+            (table, column, position[0], position[1], time.time())
+        )
+
+    def _store(self, table, rows):
+        columns = ['id', 'created_at'] + REPLICATED_TABLES[table] + ['data']
+        self.db.executemany(
+            f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [[row.get(column) for column in columns[:-1]] + [json.dumps(row, ensure_ascii=False)] for row in rows]
+        )
+
+_replicas = {}
+_replicas_lock = threading.Lock()
+
+def get_replica(supabase_url):
+    """Return the process-wide replica for a Supabase project, creating it on first use"""
+    with _replicas_lock:
+        if supabase_url not in _replicas:
+            root, ext = os.path.splitext(DEFAULT_REPLICA_PATH)
+            suffix = hashlib.sha256(supabase_url.encode('utf-8')).hexdigest()[:8]
+            _replicas[supabase_url] = LocalReplica(f"{root}-{suffix}{ext}")
+        return _replicas[supabase_url]
@@ -0,0 +1,289 @@
+import re
+import math
+import time
+import heapq
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict, defaultdict
+
+from db import fetch_changed, find_watermark_column
+
+# Searchable text columns, the same as translator.AD_FIELDS
+SEARCH_FIELDS = ['headline', 'body', 'link_text', 'product']
+
+# Indexed tables and the columns their results can be filtered on
+INDEXED_TABLES = {
+    'ad_copies': [],
+    'translations': ['country_code', 'ad_copy_id', 'quality_score'],
+}
+
+# Okapi BM25 term frequency saturation and length normalisation
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+REFRESH_INTERVAL_SECONDS = 10
+REFRESH_BATCH_SIZE = 1000
+# Removed documents stay in the postings until they outnumber a quarter of the live ones
+COMPACT_RATIO = 0.25
+MAX_TERM_FREQUENCY = 65535
+# Recent result sets kept so paging through them does not score the query again
+RESULT_CACHE_SIZE = 32
+
+WORD_PATTERN = re.compile(r'\w+')
+# Han, kana and iteration marks are written without spaces and indexed as overlapping bigrams
+CJK_RUN = re.compile(r'([\u3005\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+)')
+
+def tokenize(text):
+    """Split text into search terms: case-folded words, and character bigrams for CJK runs"""
+    tokens = []
+    for word in WORD_PATTERN.findall(unicodedata.normalize('NFKC', text or '').casefold()):
+        # split() with a group alternates non-CJK and CJK parts
+        for i, part in enumerate(CJK_RUN.split(word)):
+            if not part:
+                continue
+            if i % 2 and len(part) > 1:
+                tokens.extend(part[j:j + 2] for j in range(len(part) - 1))
+            else:
+                tokens.append(part)
+    return tokens
+
+def _is_cjk(term):
+    return CJK_RUN.fullmatch(term) is not None
+
+class _TableIndex:
+    """Postings for one table, kept in flat arrays to stay small at hundreds of thousands of rows.
+
+    Documents are numbered in the order they were added. A removed or
+    updated row leaves its old number behind as a dead document (meta set
+    to None) until compact() drops them from the postings.
+    """
+
+    def __init__(self, filter_columns):
+        self.filter_columns = filter_columns
+        self.postings = {}
+        self.lengths = array('I')
+        self.meta = []
+        self.docs = {}
+        self.total_length = 0
+        self.dead = 0
+        self.version = 0
+
+    def add(self, row):
+        self.remove(row['id'])
+        counts = defaultdict(int)
+        for name in SEARCH_FIELDS:
+            for term in tokenize(row.get(name)):
+                counts[term] += 1
+        if not counts:
+            return
+
+        doc = len(self.meta)
+        for term, count in counts.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = (array('I'), array('H'))
+            postings[0].append(doc)
+            postings[1].append(min(count, MAX_TERM_FREQUENCY))
+        length = sum(counts.values())
+        self.lengths.append(length)
+        self.total_length += length
+        self.meta.append((row['id'],) + tuple(row.get(column) for column in self.filter_columns))
+        self.docs[row['id']] = doc
+        self.version += 1
+
+    def remove(self, row_id):
+        doc = self.docs.pop(row_id, None)
+        if doc is None:
+            return
+        self.meta[doc] = None
+        self.total_length -= self.lengths[doc]
+        self.dead += 1
+        self.version += 1
+        if self.dead > 1000 and self.dead > len(self.docs) * COMPACT_RATIO:
+            self.compact()
+
+    def compact(self):
+        """Renumber the live documents and drop the dead ones from every posting list"""
+        renumbered = array('i', [-1]) * len(self.meta)
+        lengths, meta = array('I'), []
+        for doc, entry in enumerate(self.meta):
+            if entry is not None:
+                renumbered[doc] = len(meta)
+                lengths.append(self.lengths[doc])
+                meta.append(entry)
+
+        postings = {}
+        for term, (docs, frequencies) in self.postings.items():
+            kept = [(renumbered[doc], frequency) for doc, frequency in zip(docs, frequencies) if renumbered[doc] >= 0]
+            if kept:
+                postings[term] = (array('I', [doc for doc, _ in kept]), array('H', [frequency for _, frequency in kept]))
+        self.postings, self.lengths, self.meta = postings, lengths, meta
+        self.docs = {entry[0]: doc for doc, entry in enumerate(meta)}
+        self.dead = 0
+
+    def _terms(self, query):
+        terms = set()
+        for term in tokenize(query):
+            terms.add(term)
+            # A lone CJK character also matches every bigram it starts or ends
+            if len(term) == 1 and _is_cjk(term):
+                terms.update(t for t in self.postings if len(t) == 2 and term in t and _is_cjk(t))
+        return terms
+
+    def _filter(self, filters):
+        """Predicate on a meta entry for the given filters, or None when nothing is filtered"""
+        checks = [(position + 1, filters[column]) for position, column in enumerate(self.filter_columns) if filters.get(column) is not None]
+        min_quality = filters.get('min_quality')
+        quality = self.filter_columns.index('quality_score') + 1 if min_quality and 'quality_score' in self.filter_columns else None
+        if not checks and quality is None:
+            return None
+        return lambda entry: all(entry[position] == value for position, value in checks) and (quality is None or (entry[quality] or 0) >= min_quality)
+
+    def search(self, query, filters):
+        """Return (score, row_id) for every matching row, unordered"""
+        live = len(self.docs)
+        if not live:
+            return []
+        # Per-document denominator term k1 * (1 - b + b * length / average length) is base + slope * length
+        base = BM25_K1 * (1 - BM25_B)
+        slope = BM25_K1 * BM25_B * live / self.total_length
+        boost = BM25_K1 + 1
+        lengths = self.lengths
+        scores = {}
+        get = scores.get
+        for term in self._terms(query):
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            docs, frequencies = postings
+            # Posting lists still count dead documents until the next compaction
+            found = min(len(docs), live)
+            weight = math.log(1 + (live - found + 0.5) / (found + 0.5)) * boost
+            for doc, frequency in zip(docs, frequencies):
+                scores[doc] = get(doc, 0.0) + weight * frequency / (frequency + base + slope * lengths[doc])
+
+        meta = self.meta
+        matches = self._filter(filters)
+        return [
+            (score, entry[0]) for doc, score in scores.items()
+            if (entry := meta[doc]) is not None and (matches is None or matches(entry))
+        ]
+
+class SearchIndex:
+    """In-memory BM25 full-text index over ad copies and translations in every language.
+
+    Built on first use and then kept up to date incrementally: each
+    refresh() asks Supabase only for rows past the stored (watermark, id)
+    position, like the local replica does, so edits are picked up when
+    migrations/002_updated_at.sql is in place and new rows always are.
+    The app reports its own writes with update(), remove() and
+    mark_dirty(). Deletions made elsewhere are only dropped by rebuild().
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.tables = {table: _TableIndex(columns) for table, columns in INDEXED_TABLES.items()}
+        self.positions = {}
+        self.pending = defaultdict(set)
+        self.dirty = set(INDEXED_TABLES)
+        self.refreshed_at = {}
+        self.results = OrderedDict()
+
+    def refresh(self, supabase, table, force=False):
+        """Index rows changed since the last refresh, at most every REFRESH_INTERVAL_SECONDS unless forced or dirty"""
+        with self.refresh_lock:
+            with self.lock:
+                if not force and table not in self.dirty and time.time() - self.refreshed_at.get(table, 0) < REFRESH_INTERVAL_SECONDS:
+                    return 0
+                self.dirty.discard(table)
+                pending, self.pending[table] = self.pending[table], set()
+
+            if table not in self.positions:
+                self.positions[table] = (find_watermark_column(supabase, table), None)
+            column, position = self.positions[table]
+            columns = ','.join(SEARCH_FIELDS + INDEXED_TABLES[table])
+
+            indexed = 0
+            if pending:
+                rows = supabase.table(table).select(f'id,{columns}').in_('id', sorted(pending)).execute().data
+                self._add(table, rows)
+                indexed += len(rows)
+
+            for rows, position in fetch_changed(supabase, table, columns, column, position, REFRESH_BATCH_SIZE):
+                self.positions[table] = (column, position)
+                self._add(table, rows)
+                indexed += len(rows)
+
+            with self.lock:
+                self.refreshed_at[table] = time.time()
+            return indexed
+
+    def rebuild(self, supabase):
+        """Drop the index and read every table again, e.g. after deletions outside the app"""
+        with self.refresh_lock, self.lock:
+            self.tables = {table: _TableIndex(columns) for table, columns in INDEXED_TABLES.items()}
+            self.positions.clear()
+            self.pending.clear()
+            self.dirty.update(INDEXED_TABLES)
+        return sum(self.refresh(supabase, table, force=True) for table in INDEXED_TABLES)
+
+    def mark_dirty(self, table):
+        """Refresh table before its next search, e.g. after inserting rows into it"""
+        with self.lock:
+            self.dirty.add(table)
+
+    def update(self, table, row_id):
+        """Re-read a row before the next search, after an update already written to Supabase"""
+        with self.lock:
+            self.pending[table].add(row_id)
+            self.dirty.add(table)
+
+    def remove(self, table, row_id):
+        """Drop a row already deleted in Supabase"""
+        with self.lock:
+            self.tables[table].remove(row_id)
+
+    def search(self, table, query, filters=None, limit=20, offset=0):
+        """Rank rows of table against query with BM25.
+
+        filters holds equality filters on the table's filter columns and
+        min_quality. Returns ([(row_id, score)] for the requested slice,
+        total number of matching rows).
+        """
+        filters = filters or {}
+        with self.lock:
+            index = self.tables[table]
+            key = (table, query, tuple(sorted(filters.items())))
+            cached = self.results.get(key)
+            if cached is None or cached[0] != (index, index.version):
+                cached = ((index, index.version), index.search(query, filters))
+                self.results[key] = cached
+                if len(self.results) > RESULT_CACHE_SIZE:
+                    self.results.popitem(last=False)
+            self.results.move_to_end(key)
+            hits = cached[1]
+        # Ties go to the newest row
+        best = heapq.nlargest(offset + limit, hits)
+        return [(row_id, score) for score, row_id in best[offset:]], len(hits)
+
+    def size(self, table):
+        with self.lock:
+            return len(self.tables[table].docs)
+
+    def _add(self, table, rows):
+        with self.lock:
+            index = self.tables[table]
+            for row in rows:
+                index.add(row)
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_search_index(supabase_url):
+    """Return the process-wide search index for a Supabase project, creating it on first use"""
+    with _indexes_lock:
+        if supabase_url not in _indexes:
+            _indexes[supabase_url] = SearchIndex()
+        return _indexes[supabase_url]
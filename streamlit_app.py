@@ -1,9 +1,24 @@
 import streamlit as st
-import google.generativeai as genai
 from supabase import create_client, Client
-import re
-import json
+import os
+import html
+import time
 from datetime import datetime
+from translator import (
+    translate_text, stream_translation, proofread_translation, chunked, source_hashes, stale_fields, DEFAULT_MAX_WORKERS, MAX_WORKERS_LIMIT, MAX_LANGUAGES_PER_CALL
+)
+from translation_cache import get_cache
+from table_cache import get_table_cache
+from replica import get_replica
+from search_index import get_search_index, INDEXED_TABLES
+from translation_memory import get_memory, market_key
+from jobs import get_job_manager, make_task
+from prompt_eval import evaluate_prompts, sample_ad_texts
+from ad_import import import_ads, read_records
+from export import export_to_file, export_extension, EXPORT_FORMATS, EXPORT_DIR
+from gemini_client import create_model, get_rate_limiter
+from telemetry import call_labels, get_telemetry, start_metrics_server
+from db import count_rows, fetch_page, find_untranslated_ad_ids, EXACT_COUNT, ESTIMATED_COUNT, DEFAULT_PAGE_SIZE
 
 # Page config
 st.set_page_config(
@@ -387,6 +402,88 @@ if 'gemini_key' not in st.session_state:
     st.session_state.gemini_key = ""
 if 'supabase_client' not in st.session_state:
     st.session_state.supabase_client = None
+if 'use_replica' not in st.session_state:
+    st.session_state.use_replica = bool(os.environ.get('LOCAL_REPLICA'))
+
+# Prometheus can scrape model telemetry from http://<host>:$METRICS_PORT/metrics
+if os.environ.get('METRICS_PORT'):
+    start_metrics_server(int(os.environ['METRICS_PORT']))
+
+# Sidebar stats are cached briefly and cleared by the app's own inserts and deletes
+STATS_TTL_SECONDS = 30
+
+@st.cache_data(ttl=STATS_TTL_SECONDS, show_spinner=False)
+def fetch_table_counts(supabase_url, _supabase):
+    """Count rows server-side instead of downloading every id"""
+    return {
+        'ad_copies': count_rows(_supabase, 'ad_copies', EXACT_COUNT),
+        'translations': count_rows(_supabase, 'translations', ESTIMATED_COUNT),
+        'country_prompts': count_rows(_supabase, 'country_prompts', EXACT_COUNT)
+    }
+
+def get_local_replica():
+    """The local replica synced up to date, or None when it is switched off"""
+    if not st.session_state.use_replica or st.session_state.supabase_client is None:
+        return None
+    replica = get_replica(st.session_state.supabase_url)
+    replica.sync_all(st.session_state.supabase_client)
+    return replica
+
+def load_table(supabase, table):
+    """Every row of a small table, from the local replica or the shared table cache"""
+    replica = get_local_replica()
+    return replica.rows(table) if replica else get_table_cache().get(supabase, table)
+
+def forget_market(country):
+    """Drop cached translations and translation memory made with a country's prompts, before they change"""
+    market = market_key(country['system_prompt'], country['user_prompt'])
+    get_cache().invalidate_market(market)
+    get_memory().invalidate_market(market)
+
+def table_changed(table, row_id=None, changes=None, deleted=False):
+    """Reflect a write already made in Supabase in the table cache, the search index and the local replica"""
+    get_table_cache().invalidate(table)
+    if table in INDEXED_TABLES:
+        index = get_search_index(st.session_state.supabase_url)
+        if deleted:
+            index.remove(table, row_id)
+        elif row_id is not None:
+            index.update(table, row_id)
+        else:
+            index.mark_dirty(table)
+    if not st.session_state.use_replica or st.session_state.supabase_client is None:
+        return
+    replica = get_replica(st.session_state.supabase_url)
+    if deleted:
+        replica.delete(table, row_id)
+    elif row_id is not None:
+        replica.update(table, row_id, changes)
+    else:
+        replica.mark_dirty(table)
+
+def search_page(search, page_size, cursor=None):
+    """Ranked full-text search results with the same contract as db.fetch_page.
+
+    search holds the table, the query text and its filters; the cursor is
+    the offset of the next page.
+    """
+    supabase = st.session_state.supabase_client
+    index = get_search_index(st.session_state.supabase_url)
+    with st.spinner("Indexing..."):
+        index.refresh(supabase, search['table'])
+    started = time.perf_counter()
+    offset = cursor or 0
+    hits, total = index.search(search['table'], search['text'], search['filters'], page_size, offset)
+    st.session_state.search_stats = (total, time.perf_counter() - started)
+
+    ids = [row_id for row_id, score in hits]
+    replica = get_local_replica()
+    if replica:
+        rows = {row['id']: row for row in replica.rows_by_id(search['table'], ids)}
+    else:
+        rows = {row['id']: row for row in supabase.table(search['table']).select('*').in_('id', ids).execute().data} if ids else {}
+    next_cursor = offset + page_size if offset + page_size < total else None
+    return [rows[row_id] for row_id in ids if row_id in rows], next_cursor
 
 # Sidebar for API credentials
 with st.sidebar:
@@ -438,16 +535,60 @@ with st.sidebar:
     st.markdown("---")
     if st.session_state.supabase_client:
         try:
-            supabase = st.session_state.supabase_client
-            ad_count = len(supabase.table('ad_copies').select('id').execute().data)
-            trans_count = len(supabase.table('translations').select('id').execute().data)
-            country_count = len(supabase.table('country_prompts').select('id').execute().data)
+            replica = get_local_replica()
+            if replica:
+                counts = {table: replica.count(table) for table in ('ad_copies', 'translations', 'country_prompts')}
+            else:
+                counts = fetch_table_counts(st.session_state.supabase_url, st.session_state.supabase_client)
             
-            st.metric("Ad Copies", ad_count)
-            st.metric("Translations", trans_count)
-            st.metric("Countries", country_count)
+            st.metric("Ad Copies", counts['ad_copies'])
+            st.metric("Translations", counts['translations'])
+            st.metric("Countries", counts['country_prompts'])
         except Exception as e:
             st.warning(f"Could not fetch stats: {str(e)}")
+    
+    cache_stats = get_cache().get_stats()
+    st.caption(
+        f"🗃️ Translation cache: {cache_stats['memory_hits'] + cache_stats['disk_hits']} hits "
+        f"({cache_stats['memory_hits']} memory, {cache_stats['disk_hits']} disk) • "
+        f"{cache_stats['misses']} misses • {cache_stats['hit_rate']:.0%} hit rate"
+    )
+    table_stats = get_table_cache().get_stats()
+    st.caption(
+        f"📦 Table cache: {table_stats['fetches']} fetches • {table_stats['hits']} hits"
+    )
+    with st.expander("🗄️ Local Replica"):
+        st.checkbox("Read from a local copy of the tables", key="use_replica", help="Library filters, pickers and stats read a SQLite copy that syncs incrementally; writes still go to Supabase")
+        replica = get_local_replica()
+        if replica:
+            last_synced = replica.last_synced()
+            if last_synced:
+                st.caption(f"Synced {time.time() - last_synced:.0f}s ago")
+            if st.button("🔁 Full resync", use_container_width=True, help="Pull every row again, e.g. after deleting rows outside the app"):
+                with st.spinner("Syncing..."):
+                    replica.resync(st.session_state.supabase_client)
+                st.rerun()
+    
+    with st.expander("🧠 Translation Memory"):
+        memory = get_memory()
+        memory.enabled = st.checkbox("Reuse earlier translations", value=memory.enabled, help="Exact sentence matches from the same market skip the model, close matches in the same language are sent as examples")
+        if st.button("📥 Build from existing translations", use_container_width=True, disabled=st.session_state.supabase_client is None):
+            with st.spinner("Indexing translations..."):
+                added = memory.load_from_supabase(st.session_state.supabase_client)
+            st.success(f"✅ Indexed {added} translated fields")
+        memory_stats = memory.get_stats()
+        st.caption(
+            f"{sum(memory_stats['segments'].values())} segments in {len(memory_stats['segments'])} languages • "
+            f"{memory_stats['exact_hits']} calls saved ({memory_stats['exact_hit_rate']:.0%} exact) • "
+            f"{memory_stats['fuzzy_hits']} close matches ({memory_stats['fuzzy_hit_rate']:.0%}, "
+            f"avg similarity {memory_stats['average_similarity']:.2f})"
+        )
+    
+    limiter_stats = get_rate_limiter().get_stats()
+    st.caption(
+        f"🚦 Gemini: {limiter_stats['calls']} calls • {limiter_stats['retries']} retries • "
+        f"{limiter_stats['throttled']} throttled • concurrency {limiter_stats['concurrency_limit']}"
+    )
 
 # Helper functions
 def get_supabase() -> Client:
@@ -460,75 +601,143 @@ def get_gemini():
     if not st.session_state.gemini_key:
         st.error("⚠️ Please configure Gemini API key in the sidebar")
         st.stop()
-    genai.configure(api_key=st.session_state.gemini_key)
-    return genai.GenerativeModel('gemini-2.5-flash')
+    return create_model(st.session_state.gemini_key)
 
-def extract_placeholders(text):
-    """Extract all <placeholder> tags from text"""
-    return re.findall(r'<[^>]+>', text)
+PAGE_SIZE_OPTIONS = [10, 20, 50, 100]
+MAX_DOWNLOAD_BYTES = 50_000_000
 
-def translate_text(text, target_language, user_prompt, system_prompt, model):
-    """Translate text while preserving placeholders"""
-    if not text:
-        return text
-    
-    placeholders = extract_placeholders(text)
-    
-    # Replace placeholders with markers
-    temp_text = text
-    for i, placeholder in enumerate(placeholders):
-        temp_text = temp_text.replace(placeholder, f"__PLACEHOLDER_{i}__")
-    
-    # Translate
-    prompt = f"""{system_prompt}
+def fetch_current_page(state_key, make_query, reset_token=None, fetch=fetch_page):
+    """Fetch the page the user is on, going back to page 1 when filters or page size change.
 
-{user_prompt}
+    make_query() builds the query for each request, since postgrest builders keep
+    the filters, order and limit fetch_page adds to them. fetch(query, page_size,
+    cursor) returns (rows, next_cursor), db.fetch_page by default.
+    """
+    page_size = st.session_state.get(f"{state_key}_page_size", DEFAULT_PAGE_SIZE)
+    cursors_key = f"{state_key}_cursors"
+    reset_token = (reset_token, page_size)
+    if cursors_key not in st.session_state or st.session_state.get(f"{state_key}_reset") != reset_token:
+        st.session_state[cursors_key] = [None]
+        st.session_state[f"{state_key}_reset"] = reset_token
+    
+    cursors = st.session_state[cursors_key]
+    rows, next_cursor = fetch(make_query(), page_size, cursors[-1])
+    # Step back if the last rows of this page were deleted
+    while not rows and len(cursors) > 1:
+        cursors.pop()
+        rows, next_cursor = fetch(make_query(), page_size, cursors[-1])
+    return rows, next_cursor
 
-Translate the following text to {target_language}. 
-IMPORTANT: Keep __PLACEHOLDER_X__ markers exactly as they are, do not translate them.
+def render_pagination(state_key, next_cursor):
+    """Previous/next buttons and page size picker for a list fetched with fetch_current_page"""
+    cursors = st.session_state[f"{state_key}_cursors"]
+    col_prev, col_page, col_size, col_next = st.columns(4)
+    with col_prev:
+        st.button("◀ Previous", key=f"{state_key}_prev", on_click=cursors.pop, disabled=len(cursors) == 1, use_container_width=True)
+    with col_page:
+        st.markdown(f"<p style='text-align: center;'>Page {len(cursors)}</p>", unsafe_allow_html=True)
+    with col_size:
+        st.selectbox("Rows per page", PAGE_SIZE_OPTIONS, index=PAGE_SIZE_OPTIONS.index(DEFAULT_PAGE_SIZE), key=f"{state_key}_page_size", label_visibility="collapsed")
+    with col_next:
+        st.button("Next ▶", key=f"{state_key}_next", on_click=cursors.append, args=(next_cursor,), disabled=next_cursor is None, use_container_width=True)
 
-Text to translate:
-{temp_text}
+# Seconds between job status refreshes while a job runs
+JOB_POLL_SECONDS = 2
+JOB_STATUS_EMOJI = {
+    'queued': '⏳', 'running': '🔄', 'completed': '✅', 'failed': '❌', 'cancelled': '⏹️', 'interrupted': '⏸️'
+}
 
-Return ONLY the translated text, no explanations."""
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes}m" if hours else f"{minutes}m {seconds}s"
 
-    response = model.generate_content(prompt)
-    translated = response.text.strip()
-    
-    # Restore placeholders
-    for i, placeholder in enumerate(placeholders):
-        translated = translated.replace(f"__PLACEHOLDER_{i}__", placeholder)
+def render_jobs_panel(supabase):
+    """Status, progress and controls for recent translation jobs"""
+    manager = get_job_manager()
+    jobs = manager.list_jobs()
+    if not jobs:
+        return
     
-    return translated
-
-def proofread_translation(original, translated, language, model):
-    """Proofread translation and return quality score"""
-    prompt = f"""You are a translation quality expert. Evaluate this translation from English to {language}.
-
-Original: {original}
-Translation: {translated}
-
-Rate the translation quality from 0-100 based on:
-- Accuracy (meaning preserved)
-- Fluency (natural in target language)
-- Marketing tone (persuasive and engaging)
-- Grammar and spelling
+    st.markdown("### 📋 Translation Jobs")
+    st.checkbox("🔄 Auto-refresh while jobs run", value=True, key="jobs_auto_refresh")
+    for job in jobs:
+        processed = job['completed'] + job['failed']
+        col_info, col_action = st.columns([4, 1])
+        with col_info:
+            st.markdown(f"{JOB_STATUS_EMOJI.get(job['status'], '')} **Job #{job['id']}** • {job['description']} • {job['status']}")
+            st.progress(processed / job['total'] if job['total'] else 1.0)
+            details = f"{job['completed']}/{job['total']} translated • {job['failed']} failed"
+            if job['eta_seconds'] is not None:
+                details += f" • ETA {format_duration(job['eta_seconds'])}"
+            if job['total_strings']:
+                details += f" • {job['unique_strings']} unique of {job['total_strings']} strings"
+            st.caption(details)
+            if job['error']:
+                st.error(f"❌ {job['error']}")
+            if job['failed']:
+                with st.expander(f"⚠️ Failed tasks for job #{job['id']}"):
+                    for ad_id, error in manager.store.task_errors(job['id']):
+                        st.text(f"Ad ID {ad_id}: {error}")
+        with col_action:
+            if job['status'] in ('queued', 'running'):
+                if st.button("⏹️ Cancel", key=f"job_cancel_{job['id']}", use_container_width=True):
+                    manager.cancel(job['id'])
+                    st.rerun()
+            elif job['status'] == 'interrupted':
+                if st.button("▶️ Resume", key=f"job_resume_{job['id']}", use_container_width=True):
+                    manager.start(job['id'], supabase, get_gemini())
+                    st.rerun()
+                if st.button("⏹️ Cancel", key=f"job_cancel_{job['id']}", use_container_width=True):
+                    manager.cancel(job['id'])
+                    st.rerun()
 
-If there are errors, provide a corrected version.
+def render_usage_panel():
+    """Model latency, token usage and estimated cost per stage, country and language"""
+    telemetry = get_telemetry()
+    with st.expander("📈 Model Usage & Cost"):
+        by_stage = telemetry.summary('stage')
+        if not by_stage:
+            st.caption("No model calls recorded since the server started")
+            return
+        
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Calls", sum(row['calls'] for row in by_stage))
+        col2.metric("Prompt tokens", f"{sum(row['prompt_tokens'] for row in by_stage):,}")
+        col3.metric("Output tokens", f"{sum(row['output_tokens'] for row in by_stage):,}")
+        col4.metric("Estimated cost", f"${sum(row['cost'] for row in by_stage):.4f}")
+        
+        for by, title in (('stage', "By stage"), ('country', "By country"), ('language', "By language")):
+            st.markdown(f"**{title}**")
+            st.dataframe([{
+                title.split()[-1].capitalize(): row[by],
+                'Calls': row['calls'],
+                'Errors': row['errors'],
+                'Retries': row['retries'],
+                'Mean latency (s)': round(row['mean_seconds'], 2),
+                'Max latency (s)': round(row['max_seconds'], 2),
+                'Prompt tokens': row['prompt_tokens'],
+                'Output tokens': row['output_tokens'],
+                'Cost ($)': round(row['cost'], 4),
+                'Cache hits': row['cache'],
+                'Memory hits': row['memory'],
+                'Misses': row['miss']
+            } for row in telemetry.summary(by)], use_container_width=True, hide_index=True)
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("📥 Prometheus metrics", telemetry.render_prometheus(), file_name="metrics.txt", mime="text/plain", use_container_width=True)
+        with col2:
+            if st.button("🔄 Reset usage stats", use_container_width=True):
+                telemetry.reset()
+                st.rerun()
 
-Respond ONLY in this JSON format:
-{{"score": <0-100>, "corrected": "<corrected translation or original if good>", "feedback": "<brief feedback>"}}"""
+def set_editing(state_key, row_id):
+    st.session_state[state_key] = row_id
 
-    response = model.generate_content(prompt)
-    result_text = response.text.strip()
-    
-    # Extract JSON
-    json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
-    if json_match:
-        result = json.loads(json_match.group())
-        return result['score'], result['corrected'], result.get('feedback', '')
-    
-    return 85, translated, "Auto-approved"
+def show_field(label, value):
+    """Read-only field display, escaped so <placeholders> stay visible"""
+    st.markdown(f"**{label}:** {html.escape(value or '—')}")
 
 # Navigation
 tab1, tab2, tab3, tab4 = st.tabs(["Ad Copies", "Translations", "Test Prompts", "Countries"])
@@ -562,22 +771,72 @@ with tab1:
                         'link_text': link_text,
                         'product': product
                     }).execute()
+                    table_changed('ad_copies')
+                    fetch_table_counts.clear()
                     st.success("✅ Ad copy created successfully!")
                     st.rerun()
                 else:
                     st.error("⚠️ Headline and Body are required fields")
+        
+        st.markdown("### 📥 Import Ad Copies")
+        uploaded = st.file_uploader("CSV or JSONL file", type=['csv', 'jsonl'], help="Columns: headline, body, link_text, product. Ads already in the library are skipped.")
+        if uploaded is not None and st.button("📥 Import", use_container_width=True):
+            supabase = get_supabase()
+            progress_bar = st.progress(0)
+            status_text = st.empty()
+            
+            bytes_read = [0]
+            
+            def count_bytes(size):
+                bytes_read[0] += size
+            
+            def show_import_progress(result):
+                progress_bar.progress(min(bytes_read[0] / max(uploaded.size, 1), 1.0))
+                status_text.text(f"Read {result['read']} rows • {result['inserted']} imported • {result['duplicates']} duplicates • {len(result['errors'])} errors")
+            
+            # Bad rows come back as errors, so the rows already written are always counted
+            st.session_state.last_import = import_ads(supabase, read_records(uploaded, uploaded.name, count_bytes), on_progress=show_import_progress)
+            table_changed('ad_copies')
+            fetch_table_counts.clear()
+            # One rerun for the whole import so the list picks up the new ads
+            st.rerun()
+        
+        last_import = st.session_state.get('last_import')
+        if last_import:
+            st.success(f"✅ Imported {last_import['inserted']} of {last_import['read']} rows • {last_import['duplicates']} duplicates skipped")
+            if last_import['errors']:
+                with st.expander(f"⚠️ {len(last_import['errors'])} rows not imported"):
+                    st.dataframe([{'Row': number, 'Error': error} for number, error in last_import['errors']], use_container_width=True, hide_index=True)
     
     with col2:
         st.markdown("### 📚 Existing Ad Copies")
         
         supabase = get_supabase()
-        ad_copies = supabase.table('ad_copies').select('*').order('created_at', desc=True).execute()
+        ads_search = st.text_input("🔎 Search ad copies", placeholder="Headline, body, link text or product", key="ads_search", label_visibility="collapsed").strip()
+        if ads_search:
+            ad_copies, next_cursor = fetch_current_page('ads_page', lambda: {'table': 'ad_copies', 'text': ads_search, 'filters': {}}, ads_search, fetch=search_page)
+            matches, seconds = st.session_state.search_stats
+            st.caption(f"🔎 {matches} matches, best first ({seconds * 1000:.0f} ms)")
+        else:
+            ad_copies, next_cursor = fetch_current_page('ads_page', lambda: supabase.table('ad_copies').select('*'))
         
-        if ad_copies.data:
-            for ad in ad_copies.data:
-                with st.expander(f"📄 {ad['headline'][:60]}... (ID: {ad['id']})", expanded=False):
+        if ad_copies:
+            for ad in ad_copies:
+                editing = st.session_state.get('editing_ad') == ad['id']
+                with st.expander(f"📄 {ad['headline'][:60]}... (ID: {ad['id']})", expanded=editing):
                     col_a, col_b = st.columns([3, 1])
                     
+                    # Input widgets are only built for the ad being edited
+                    if not editing:
+                        with col_a:
+                            show_field("Headline", ad['headline'])
+                            show_field("Body", ad['body'])
+                            show_field("Link Text", ad.get('link_text'))
+                            show_field("Product", ad.get('product'))
+                        with col_b:
+                            st.button("✏️ Edit", key=f"edit_{ad['id']}", on_click=set_editing, args=('editing_ad', ad['id']), use_container_width=True)
+                        continue
+                    
                     with col_a:
                         new_headline = st.text_input("Headline", value=ad['headline'], key=f"h_{ad['id']}")
                         new_body = st.text_area("Body", value=ad['body'], key=f"b_{ad['id']}", height=100)
@@ -588,19 +847,52 @@ with tab1:
                             st.markdown("")
                             st.markdown("")
                             if st.button("💾 Update", key=f"upd_{ad['id']}", use_container_width=True):
-                                supabase.table('ad_copies').update({
+                                changes = {
                                     'headline': new_headline,
                                     'body': new_body,
                                     'link_text': new_link_text,
                                     'product': new_product
-                                }).eq('id', ad['id']).execute()
+                                }
+                                supabase.table('ad_copies').update(changes).eq('id', ad['id']).execute()
+                                table_changed('ad_copies', ad['id'], changes)
+                                st.session_state.editing_ad = None
                                 st.success("✅ Updated!")
+                                
+                                # Re-translate only the changed fields of existing translations
+                                updated_ad = {**ad, **changes}
+                                existing = supabase.table('translations').select('*').eq('ad_copy_id', ad['id']).execute().data
+                                # Rows saved before source_hashes existed are taken to match the ad as it was before this edit
+                                existing = [t if t.get('source_hashes') else {**t, 'source_hashes': source_hashes(ad)} for t in existing]
+                                countries_by_code = {c['country_code']: c for c in load_table(supabase, 'country_prompts')}
+                                refresh_tasks = [
+                                    make_task(updated_ad, [countries_by_code[t['country_code']]], t)
+                                    for t in existing
+                                    if t['country_code'] in countries_by_code and stale_fields(updated_ad, t)
+                                ]
+                                if refresh_tasks:
+                                    job_id = get_job_manager().enqueue(
+                                        'refresh',
+                                        f"Refresh {len(refresh_tasks)} translations of Ad ID {ad['id']}",
+                                        refresh_tasks,
+                                        supabase,
+                                        get_gemini()
+                                    )
+                                    st.toast(f"🔄 Job #{job_id} is updating {len(refresh_tasks)} translations")
                                 st.rerun()
                             
                             if st.button("🗑️ Delete", key=f"del_{ad['id']}", use_container_width=True):
                                 supabase.table('ad_copies').delete().eq('id', ad['id']).execute()
+                                table_changed('ad_copies', ad['id'], deleted=True)
+                                fetch_table_counts.clear()
+                                st.session_state.editing_ad = None
                                 st.success("🗑️ Deleted!")
                                 st.rerun()
+                            
+                            st.button("✖️ Cancel", key=f"cancel_{ad['id']}", on_click=set_editing, args=('editing_ad', None), use_container_width=True)
+            
+            render_pagination('ads_page', next_cursor)
+        elif ads_search:
+            st.info("🔍 No ad copies match your search.")
         else:
             st.info("📭 No ad copies yet. Create your first one using the form on the left!")
 
@@ -611,12 +903,12 @@ with tab2:
     st.markdown("")
     
     supabase = get_supabase()
-    ad_copies = supabase.table('ad_copies').select('*').execute()
-    countries = supabase.table('country_prompts').select('*').execute()
+    ad_copies = load_table(supabase, 'ad_copies')
+    countries = load_table(supabase, 'country_prompts')
     
-    if not ad_copies.data:
+    if not ad_copies:
         st.warning("⚠️ Please create ad copies first in the 'Ad Copies' tab")
-    elif not countries.data:
+    elif not countries:
         st.warning("⚠️ Please add countries first in the 'Countries' tab")
     else:
         st.markdown("### 🚀 Bulk Translation")
@@ -625,129 +917,164 @@ with tab2:
         with col1:
             selected_ads = st.multiselect(
                 "Select Ad Copies",
-                options=ad_copies.data,
+                options=ad_copies,
                 format_func=lambda x: f"{x['headline'][:50]}... (ID: {x['id']})",
-                default=[ad_copies.data[0]] if ad_copies.data else [],
+                default=[ad_copies[0]] if ad_copies else [],
                 help="Choose one or more ad copies to translate"
             )
         
         with col2:
             selected_countries = st.multiselect(
                 "Select Target Countries",
-                options=[c['country_code'] for c in countries.data],
-                default=[c['country_code'] for c in countries.data[:2]],
+                options=[c['country_code'] for c in countries],
+                default=[c['country_code'] for c in countries[:2]],
                 help="Choose destination languages"
             )
         
+        col1, col2 = st.columns(2)
+        with col1:
+            max_workers = st.slider(
+                "⚡ Parallel Workers",
+                min_value=1,
+                max_value=MAX_WORKERS_LIMIT,
+                value=DEFAULT_MAX_WORKERS,
+                help="Number of translation tasks running at the same time"
+            )
+        with col2:
+            st.markdown("")
+            fan_out = st.checkbox(
+                "🌐 Combine countries in one prompt",
+                value=True,
+                help=f"Translate each ad into up to {MAX_LANGUAGES_PER_CALL} languages with a single request"
+            )
+        
         if st.button("🚀 Start Translation", use_container_width=True, type="primary"):
             if selected_ads and selected_countries:
                 model = get_gemini()
                 
-                total_tasks = len(selected_ads) * len(selected_countries)
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                task_count = 0
-                
-                for ad in selected_ads:
-                    for country_code in selected_countries:
-                        status_text.text(f"🔄 Translating Ad ID {ad['id']} to {country_code}...")
-                        
-                        # Get country prompts
-                        country = next((c for c in countries.data if c['country_code'] == country_code), None)
-                        
-                        # Translate each field
-                        headline_trans = translate_text(
-                            ad['headline'],
-                            country['language'],
-                            country['user_prompt'],
-                            country['system_prompt'],
-                            model
-                        )
-                        
-                        body_trans = translate_text(
-                            ad['body'],
-                            country['language'],
-                            country['user_prompt'],
-                            country['system_prompt'],
-                            model
-                        )
-                        
-                        link_trans = translate_text(
-                            ad.get('link_text', ''),
-                            country['language'],
-                            country['user_prompt'],
-                            country['system_prompt'],
-                            model
-                        ) if ad.get('link_text') else ''
-                        
-                        product_trans = translate_text(
-                            ad.get('product', ''),
-                            country['language'],
-                            country['user_prompt'],
-                            country['system_prompt'],
-                            model
-                        ) if ad.get('product') else ''
-                        
-                        # Proofread
-                        score, corrected_body, feedback = proofread_translation(
-                            ad['body'],
-                            body_trans,
-                            country['language'],
-                            model
-                        )
-                        
-                        # Save translation
-                        supabase.table('translations').insert({
-                            'ad_copy_id': ad['id'],
-                            'country_code': country_code,
-                            'language': country['language'],
-                            'headline': headline_trans,
-                            'body': corrected_body,
-                            'link_text': link_trans,
-                            'product': product_trans,
-                            'quality_score': score
-                        }).execute()
-                        
-                        task_count += 1
-                        progress_bar.progress(task_count / total_tasks)
+                countries_by_code = {c['country_code']: c for c in countries}
+                target_countries = [countries_by_code[code] for code in selected_countries]
+                group_size = MAX_LANGUAGES_PER_CALL if fan_out else 1
+                tasks = [make_task(ad, group) for ad in selected_ads for group in chunked(target_countries, group_size)]
                 
-                status_text.text("✅ Translation complete!")
-                st.success(f"✅ Successfully translated {len(selected_ads)} ad copies to {len(selected_countries)} countries!")
-                st.balloons()
-                st.rerun()
+                # The job runs on a background thread, progress shows up under Translation Jobs
+                job_id = get_job_manager().enqueue(
+                    'bulk',
+                    f"{len(selected_ads)} ad copies → {', '.join(selected_countries)}",
+                    tasks,
+                    supabase,
+                    model,
+                    max_workers
+                )
+                st.success(f"✅ Job #{job_id} started: {len(selected_ads) * len(target_countries)} translations queued")
+        
+        render_jobs_panel(supabase)
+        render_usage_panel()
         
         st.markdown("---")
         st.markdown("### 📚 Translation Library")
         
+        col_search, col_rebuild = st.columns([4, 1])
+        with col_search:
+            library_search = st.text_input("🔎 Search", placeholder="Words in any language, e.g. Nike or 夏のセール", key="library_search", label_visibility="collapsed").strip()
+        with col_rebuild:
+            if st.button("🔄 Rebuild Index", use_container_width=True, help="Re-read every row, e.g. after translations were deleted outside the app"):
+                with st.spinner("Indexing..."):
+                    get_search_index(st.session_state.supabase_url).rebuild(supabase)
+        
         # Filters
         col1, col2, col3 = st.columns(3)
         with col1:
-            filter_country = st.selectbox("🌍 Filter by Country", ["All"] + [c['country_code'] for c in countries.data])
+            filter_country = st.selectbox("🌍 Filter by Country", ["All"] + [c['country_code'] for c in countries])
         with col2:
-            filter_ad = st.selectbox("📄 Filter by Ad Copy", ["All"] + [f"ID {a['id']}" for a in ad_copies.data])
+            filter_ad = st.selectbox("📄 Filter by Ad Copy", ["All"] + [f"ID {a['id']}" for a in ad_copies])
         with col3:
             filter_quality = st.slider("⭐ Min Quality Score", 0, 100, 0)
         
-        # Fetch translations
-        query = supabase.table('translations').select('*')
-        
-        if filter_country != "All":
-            query = query.eq('country_code', filter_country)
+        # Fetch translations, with a fresh query builder for every request
+        def library_query():
+            query = supabase.table('translations').select('*')
+            
+            if filter_country != "All":
+                query = query.eq('country_code', filter_country)
+            
+            if filter_ad != "All":
+                ad_id = int(filter_ad.split()[1])
+                query = query.eq('ad_copy_id', ad_id)
+            
+            return query.gte('quality_score', filter_quality)
         
-        if filter_ad != "All":
-            ad_id = int(filter_ad.split()[1])
-            query = query.eq('ad_copy_id', ad_id)
+        with st.expander("📤 Export"):
+            st.caption("Exports every translation matching the filters above, streamed to a file on the server")
+            col_format, col_button = st.columns([3, 1])
+            with col_format:
+                export_format = st.selectbox("Format", list(EXPORT_FORMATS), format_func=EXPORT_FORMATS.get, label_visibility="collapsed")
+            with col_button:
+                if st.button("📤 Export", use_container_width=True):
+                    os.makedirs(EXPORT_DIR, exist_ok=True)
+                    path = os.path.join(EXPORT_DIR, f"translations_{export_format}_{datetime.now():%Y%m%d_%H%M%S}.{export_extension(export_format)}")
+                    with st.spinner("Exporting..."):
+                        exported = export_to_file(
+                            supabase,
+                            path,
+                            export_format,
+                            country_code=None if filter_country == "All" else filter_country,
+                            ad_copy_id=None if filter_ad == "All" else int(filter_ad.split()[1]),
+                            min_quality=filter_quality
+                        )
+                    st.session_state.last_export = (path, exported)
+            
+            if st.session_state.get('last_export'):
+                path, exported = st.session_state.last_export
+                size = os.path.getsize(path) if os.path.exists(path) else 0
+                st.success(f"✅ Exported {exported} translations to `{path}` ({size / 1_000_000:.1f} MB)")
+                # Downloads are sent from memory, so very large files are left on the server
+                if 0 < size <= MAX_DOWNLOAD_BYTES:
+                    with open(path, 'rb') as f:
+                        st.download_button("📥 Download", f, file_name=os.path.basename(path), use_container_width=True)
+                elif size:
+                    st.info("📁 The file is too large to download here, fetch it from the server")
         
-        translations = query.gte('quality_score', filter_quality).order('created_at', desc=True).execute()
+        library_filters = (filter_country, filter_ad, filter_quality, library_search)
+        filters = {
+            'country_code': None if filter_country == "All" else filter_country,
+            'ad_copy_id': None if filter_ad == "All" else int(filter_ad.split()[1]),
+            'min_quality': filter_quality
+        }
+        replica = get_local_replica()
+        if library_search:
+            translations, next_cursor = fetch_current_page('library_page', lambda: {
+                'table': 'translations', 'text': library_search, 'filters': filters
+            }, library_filters, fetch=search_page)
+            matches, seconds = st.session_state.search_stats
+            st.caption(f"🔎 {matches} matches, best first ({seconds * 1000:.0f} ms)")
+        elif replica:
+            translations, next_cursor = fetch_current_page('library_page', lambda: filters, library_filters, fetch=replica.translations_page)
+        else:
+            translations, next_cursor = fetch_current_page('library_page', library_query, library_filters)
         
-        if translations.data:
-            for trans in translations.data:
+        if translations:
+            for trans in translations:
                 score = trans['quality_score']
                 score_emoji = "🟢" if score >= 80 else "🟡" if score >= 60 else "🔴"
+                quality_class = "quality-high" if score >= 80 else "quality-medium" if score >= 60 else "quality-low"
+                editing = st.session_state.get('editing_translation') == trans['id']
                 
-                with st.expander(f"{score_emoji} {trans['country_code']} • {trans['headline'][:50]}... • Score: {score}%"):
+                with st.expander(f"{score_emoji} {trans['country_code']} • {trans['headline'][:50]}... • Score: {score}%", expanded=editing):
                     col_a, col_b = st.columns([3, 1])
                     
+                    # Input widgets are only built for the translation being edited
+                    if not editing:
+                        with col_a:
+                            show_field("Headline", trans['headline'])
+                            show_field("Body", trans['body'])
+                            show_field("Link Text", trans.get('link_text'))
+                            show_field("Product", trans.get('product'))
+                            st.markdown(f'<div class="quality-badge {quality_class}">Quality Score: {score}%</div>', unsafe_allow_html=True)
+                        with col_b:
+                            st.button("✏️ Edit", key=f"tedit_{trans['id']}", on_click=set_editing, args=('editing_translation', trans['id']), use_container_width=True)
+                        continue
+                    
                     with col_a:
                         new_headline_trans = st.text_input("Headline", value=trans['headline'], key=f"th_{trans['id']}")
                         new_body_trans = st.text_area("Body", value=trans['body'], key=f"tb_{trans['id']}", height=100)
@@ -755,26 +1082,35 @@ with tab2:
                         new_product_trans = st.text_input("Product", value=trans.get('product', ''), key=f"tp_{trans['id']}")
                         
                         # Quality score display
-                        quality_class = "quality-high" if score >= 80 else "quality-medium" if score >= 60 else "quality-low"
                         st.markdown(f'<div class="quality-badge {quality_class}">Quality Score: {score}%</div>', unsafe_allow_html=True)
 
                     with col_b:
                         st.markdown("")
                         st.markdown("")
                         if st.button("💾 Update", key=f"tupd_{trans['id']}", use_container_width=True):
-                            supabase.table('translations').update({
+                            edits = {
                                 'headline': new_headline_trans,
                                 'body': new_body_trans,
                                 'link_text': new_link_text_trans,
                                 'product': new_product_trans
-                            }).eq('id', trans['id']).execute()
+                            }
+                            supabase.table('translations').update(edits).eq('id', trans['id']).execute()
+                            table_changed('translations', trans['id'], edits)
+                            st.session_state.editing_translation = None
                             st.success("✅ Updated!")
                             st.rerun()
                         
                         if st.button("🗑️ Delete", key=f"tdel_{trans['id']}", use_container_width=True):
                             supabase.table('translations').delete().eq('id', trans['id']).execute()
+                            table_changed('translations', trans['id'], deleted=True)
+                            fetch_table_counts.clear()
+                            st.session_state.editing_translation = None
                             st.success("🗑️ Deleted!")
                             st.rerun()
+                        
+                        st.button("✖️ Cancel", key=f"tcancel_{trans['id']}", on_click=set_editing, args=('editing_translation', None), use_container_width=True)
+            
+            render_pagination('library_page', next_cursor)
 
         else:
             st.info("🔍 No translations found matching your filters. Try adjusting the filters or create new translations above!")
@@ -786,12 +1122,12 @@ with tab3:
     st.markdown("")
     
     supabase = get_supabase()
-    countries = supabase.table('country_prompts').select('*').execute()
+    countries = load_table(supabase, 'country_prompts')
     
-    if countries.data:
+    if countries:
         selected_country = st.selectbox(
             "🌍 Select Country to Test",
-            options=countries.data,
+            options=countries,
             format_func=lambda x: f"{x['country_code']} - {x['language']}"
         )
         
@@ -806,27 +1142,11 @@ with tab3:
             st.markdown("### 📄 Sample Text")
             sample_text = st.text_area("Test Text", value="Get <discount>% off on <product> today! Limited time offer.", height=120, help="Enter text with <placeholders> to test")
         
+        stream_output = st.checkbox("⚡ Stream the translation as it is generated", value=True, help="Shows output as soon as the model starts answering; use Stop in the top right to abort a bad run")
+        
         if st.button("🧪 Run Test Translation", use_container_width=True, type="primary"):
             model = get_gemini()
-            
-            with st.spinner("🔄 Translating and analyzing..."):
-                translated = translate_text(
-                    sample_text,
-                    selected_country['language'],
-                    test_user,
-                    test_system,
-                    model
-                )
-                
-                score, corrected, feedback = proofread_translation(
-                    sample_text,
-                    translated,
-                    selected_country['language'],
-                    model
-                )
-            
-            st.success("✅ Test complete!")
-            st.markdown("")
+            started = time.perf_counter()
             
             col1, col2 = st.columns(2)
             with col1:
@@ -834,21 +1154,145 @@ with tab3:
                 st.info(sample_text)
             with col2:
                 st.markdown("### 📥 Translation")
-                st.success(corrected)
-                
+                translation_slot = st.empty()
+            
+            # Test calls count towards this market in the usage panel
+            with call_labels(country=selected_country['country_code']):
+                first_token_seconds = None
+                if stream_output:
+                    for translated in stream_translation(
+                        sample_text,
+                        selected_country['language'],
+                        test_user,
+                        test_system,
+                        model
+                    ):
+                        if first_token_seconds is None:
+                            first_token_seconds = time.perf_counter() - started
+                        translation_slot.success(translated)
+                else:
+                    with st.spinner("🔄 Translating..."):
+                        translated = translate_text(
+                            sample_text,
+                            selected_country['language'],
+                            test_user,
+                            test_system,
+                            model
+                        )
+                translation_seconds = time.perf_counter() - started
+            
+                with st.spinner("🔍 Proofreading..."):
+                    score, corrected, feedback = proofread_translation(
+                        sample_text,
+                        translated,
+                        selected_country['language'],
+                        model
+                    )
+            total_seconds = time.perf_counter() - started
+            
+            translation_slot.success(corrected)
+            with col2:
                 score_color = "🟢" if score >= 80 else "🟡" if score >= 60 else "🔴"
                 quality_class = "quality-high" if score >= 80 else "quality-medium" if score >= 60 else "quality-low"
                 st.markdown(f'<div class="quality-badge {quality_class}">{score_color} Quality Score: {score}%</div>', unsafe_allow_html=True)
                 st.markdown(f"**💬 Feedback:** {feedback}")
             
+            timings = [f"Translation {translation_seconds:.2f}s", f"Total {total_seconds:.2f}s"]
+            if first_token_seconds is not None:
+                timings.insert(0, f"First token {first_token_seconds:.2f}s")
+            st.caption("⏱️ " + " • ".join(timings))
+            st.success("✅ Test complete!")
+            
             st.markdown("")
             if st.button("✅ Save These Prompts to Production", use_container_width=True):
-                supabase.table('country_prompts').update({
-                    'system_prompt': test_system,
-                    'user_prompt': test_user
-                }).eq('id', selected_country['id']).execute()
+                prompts = {'system_prompt': test_system, 'user_prompt': test_user}
+                supabase.table('country_prompts').update(prompts).eq('id', selected_country['id']).execute()
+                table_changed('country_prompts', selected_country['id'], prompts)
+                forget_market(selected_country)
                 st.success("✅ Prompts updated in production!")
                 st.rerun()
+        
+        st.markdown("---")
+        st.markdown("### 📊 Batch Evaluation")
+        st.markdown("Compare prompt variants against the production prompts over many samples before saving.")
+        
+        variant_count = st.number_input("Variants to compare", min_value=1, max_value=5, value=1, help="In addition to the current production prompts")
+        variants = [{'name': "Production", 'system_prompt': selected_country['system_prompt'], 'user_prompt': selected_country['user_prompt']}]
+        for i in range(int(variant_count)):
+            with st.expander(f"✏️ Variant {i + 1}", expanded=i == 0):
+                variants.append({
+                    'name': f"Variant {i + 1}",
+                    'system_prompt': st.text_area("System Prompt", value=test_system, height=100, key=f"eval_system_{selected_country['id']}_{i}"),
+                    'user_prompt': st.text_area("User Prompt", value=test_user, height=100, key=f"eval_user_{selected_country['id']}_{i}")
+                })
+        
+        sample_source = st.radio("Samples", ["✍️ Custom texts", "🎲 Random ad copies"], horizontal=True)
+        if sample_source == "✍️ Custom texts":
+            custom_samples = st.text_area("Sample texts, one per line", value=sample_text, height=120)
+        else:
+            random_sample_size = st.slider("Ad copies to sample", 1, 20, 5)
+        eval_workers = st.slider("Parallel Workers", 1, MAX_WORKERS_LIMIT, DEFAULT_MAX_WORKERS, key="eval_workers")
+        
+        if st.button("📊 Run Batch Evaluation", use_container_width=True):
+            if sample_source == "✍️ Custom texts":
+                samples = [line.strip() for line in custom_samples.splitlines() if line.strip()]
+            else:
+                samples = sample_ad_texts(supabase, random_sample_size)
+            
+            if not samples:
+                st.warning("⚠️ No sample texts to evaluate")
+            else:
+                progress_bar = st.progress(0)
+                status_text = st.empty()
+                
+                def show_progress(done, total):
+                    progress_bar.progress(done / total)
+                    status_text.text(f"Evaluated {done}/{total} translations")
+                
+                results = evaluate_prompts(variants, samples, selected_country['language'], get_gemini(), eval_workers, show_progress, selected_country['country_code'])
+                status_text.empty()
+                st.session_state.prompt_eval = {
+                    'country_id': selected_country['id'],
+                    'samples': len(samples),
+                    'variants': variants,
+                    'results': results
+                }
+        
+        evaluation = st.session_state.get('prompt_eval')
+        if evaluation and evaluation['country_id'] == selected_country['id']:
+            st.markdown(f"#### Results over {evaluation['samples']} samples")
+            table = []
+            for variant, result in zip(evaluation['variants'], evaluation['results']):
+                row = {'Variant': variant['name'], 'Trials': result['trials'], 'Errors': result['errors']}
+                if result['trials']:
+                    row.update({
+                        'Mean': round(result['mean_score'], 1),
+                        'Median': result['median_score'],
+                        'Std dev': round(result['stdev_score'], 1),
+                        'Min': result['min_score'],
+                        'Max': result['max_score'],
+                        'Mean latency (s)': round(result['mean_latency'], 2),
+                        'Max latency (s)': round(result['max_latency'], 2)
+                    })
+                table.append(row)
+            st.dataframe(table, use_container_width=True, hide_index=True)
+            
+            scored = [(result['mean_score'], i) for i, result in enumerate(evaluation['results']) if result['trials']]
+            if scored:
+                best_score, best_index = max(scored)
+                best = evaluation['variants'][best_index]
+                if best_index == 0:
+                    st.info(f"🏆 The production prompts scored best ({best_score:.1f} mean)")
+                else:
+                    st.success(f"🏆 {best['name']} scored best ({best_score:.1f} mean vs {evaluation['results'][0].get('mean_score', 0):.1f} for production)")
+                    if st.button(f"✅ Save {best['name']} to Production", use_container_width=True):
+                        prompts = {'system_prompt': best['system_prompt'], 'user_prompt': best['user_prompt']}
+                        supabase.table('country_prompts').update(prompts).eq('id', selected_country['id']).execute()
+                        table_changed('country_prompts', selected_country['id'], prompts)
+                        forget_market(selected_country)
+                        del st.session_state.prompt_eval
+                        st.success("✅ Prompts updated in production!")
+                        st.rerun()
     else:
         st.warning("⚠️ No countries configured yet. Add one in the 'Countries' tab first!")
 
@@ -879,6 +1323,8 @@ with tab4:
                         'system_prompt': system_prompt,
                         'user_prompt': user_prompt
                     }).execute()
+                    table_changed('country_prompts')
+                    fetch_table_counts.clear()
                     st.success(f"✅ Country {country_code} added successfully!")
                     st.rerun()
                 else:
@@ -888,10 +1334,10 @@ with tab4:
         st.markdown("### 🌍 Existing Countries")
         
         supabase = get_supabase()
-        countries = supabase.table('country_prompts').select('*').execute()
+        countries = load_table(supabase, 'country_prompts')
         
-        if countries.data:
-            for country in countries.data:
+        if countries:
+            for country in countries:
                 with st.expander(f"🌍 {country['country_code']} - {country['language']}"):
                     # Make text areas editable
                     new_system_prompt = st.text_area("System Prompt", value=country['system_prompt'], key=f"cs_{country['id']}", height=100)
@@ -902,52 +1348,48 @@ with tab4:
                     
                     with col_update:
                         if st.button("💾 Update", key=f"cupd_{country['id']}", use_container_width=True):
-                            supabase.table('country_prompts').update({
-                                'system_prompt': new_system_prompt,
-                                'user_prompt': new_user_prompt
-                            }).eq('id', country['id']).execute()
+                            prompts = {'system_prompt': new_system_prompt, 'user_prompt': new_user_prompt}
+                            supabase.table('country_prompts').update(prompts).eq('id', country['id']).execute()
+                            table_changed('country_prompts', country['id'], prompts)
+                            forget_market(country)
                             st.success("✅ Updated!")
                             st.rerun()
                     
                     with col_trans:
                         if st.button(f"🔄 Translate All Ad Copies to {country['country_code']}", key=f"trans_all_{country['id']}"):
                             model = get_gemini()
-                            ad_copies = supabase.table('ad_copies').select('*').execute()
+                            ad_copies = load_table(supabase, 'ad_copies')
                             
-                            progress_bar = st.progress(0)
-                            for idx, ad in enumerate(ad_copies.data):
-                                # Check if translation exists
-                                existing = supabase.table('translations').select('id').eq('ad_copy_id', ad['id']).eq('country_code', country['country_code']).execute()
-                                
-                                if not existing.data:
-                                    headline_trans = translate_text(ad['headline'], country['language'], country['user_prompt'], country['system_prompt'], model)
-                                    body_trans = translate_text(ad['body'], country['language'], country['user_prompt'], country['system_prompt'], model)
-                                    link_trans = translate_text(ad.get('link_text', ''), country['language'], country['user_prompt'], country['system_prompt'], model) if ad.get('link_text') else ''
-                                    product_trans = translate_text(ad.get('product', ''), country['language'], country['user_prompt'], country['system_prompt'], model) if ad.get('product') else ''
-                                    
-                                    score, corrected_body, _ = proofread_translation(ad['body'], body_trans, country['language'], model)
-                                    
-                                    supabase.table('translations').insert({
-                                        'ad_copy_id': ad['id'],
-                                        'country_code': country['country_code'],
-                                        'language': country['language'],
-                                        'headline': headline_trans,
-                                        'body': corrected_body,
-                                        'link_text': link_trans,
-                                        'product': product_trans,
-                                        'quality_score': score
-                                    }).execute()
-                                
-                                progress_bar.progress((idx + 1) / len(ad_copies.data))
+                            # One projected query finds every ad still missing this country
+                            missing_ids = set(find_untranslated_ad_ids(supabase, [ad['id'] for ad in ad_copies], country['country_code']))
+                            missing_ads = [ad for ad in ad_copies if ad['id'] in missing_ids]
                             
-                            st.success(f"✅ All ad copies translated to {country['country_code']}!")
-                            st.rerun()
+                            if not missing_ads:
+                                st.info(f"✅ Every ad copy already has a {country['country_code']} translation")
+                            else:
+                                job_id = get_job_manager().enqueue(
+                                    'backfill',
+                                    f"Backfill {len(missing_ads)} ad copies → {country['country_code']}",
+                                    [make_task(ad, [country]) for ad in missing_ads],
+                                    supabase,
+                                    model
+                                )
+                                st.success(f"✅ Job #{job_id} started: {len(missing_ads)} missing ad copies queued. Follow it under Translation Jobs in the Translations tab.")
                     
                     with col_delete:
                         if st.button("🗑️ Delete", key=f"cdel_{country['id']}", use_container_width=True):
                             supabase.table('country_prompts').delete().eq('id', country['id']).execute()
+                            table_changed('country_prompts', country['id'], deleted=True)
+                            fetch_table_counts.clear()
+                            forget_market(country)
                             st.success("🗑️ Deleted!")
                             st.rerun()
         else:
             st.info("📭 No countries configured yet. Add one using the form on the left!")
 
+# Poll job progress while any translation job is running
+if st.session_state.get("jobs_auto_refresh", True) and get_job_manager().has_active_jobs():
+    time.sleep(JOB_POLL_SECONDS)
+    fetch_table_counts.clear()
+    table_changed('translations')
+    st.rerun()
@@ -0,0 +1,63 @@
+import time
+import threading
+from collections import defaultdict
+
+from db import fetch_all
+
+# How long a cached table is served before it is read again, even without writes
+TABLE_CACHE_TTL_SECONDS = 60
+
+class TableCache:
+    """Process-wide read-through cache for small tables read whole, like ad_copies and country_prompts.
+
+    Each table has a version stamp that writers bump with invalidate().
+    An entry is served while its version is current and it is younger than
+    the TTL, so one script run (and every session in the process) reads a
+    table at most once until something changes it. Callers get copies of
+    the rows and may modify them.
+    """
+
+    def __init__(self, ttl=TABLE_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.versions = defaultdict(int)
+        self.stats = {'hits': 0, 'fetches': 0}
+
+    def get(self, supabase, table):
+        """Return every row of table, from the cache when it is fresh"""
+        # Sessions connected to different projects must not share rows
+        key = (getattr(supabase, 'supabase_url', id(supabase)), table)
+        with self.lock:
+            version = self.versions[table]
+            entry = self.entries.get(key)
+            if entry and entry[0] == version and time.monotonic() - entry[1] < self.ttl:
+                self.stats['hits'] += 1
+                return [dict(row) for row in entry[2]]
+
+        rows = list(fetch_all(supabase, table))
+        with self.lock:
+            self.stats['fetches'] += 1
+            # Stored under the version read before the fetch, so a write that raced it forces a refetch
+            self.entries[key] = (version, time.monotonic(), rows)
+        return [dict(row) for row in rows]
+
+    def invalidate(self, table):
+        """Mark every cached copy of table as stale"""
+        with self.lock:
+            self.versions[table] += 1
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats)
+
+_table_cache = None
+_table_cache_lock = threading.Lock()
+
+def get_table_cache():
+    """Return the process-wide table cache, creating it on first use"""
+    global _table_cache
+    with _table_cache_lock:
+        if _table_cache is None:
+            _table_cache = TableCache()
+        return _table_cache
@@ -0,0 +1,185 @@
+import os
+import threading
+import contextvars
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# USD per million tokens, defaults are Gemini 2.5 Flash list prices
+INPUT_COST_PER_MILLION = float(os.environ.get('GEMINI_INPUT_COST_PER_MILLION', 0.30))
+OUTPUT_COST_PER_MILLION = float(os.environ.get('GEMINI_OUTPUT_COST_PER_MILLION', 2.50))
+
+# Upper bounds of the call duration histogram, in seconds
+DURATION_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 30, 60)
+
+# country tells apart markets that share a language, like ES and MX
+LABEL_NAMES = ('stage', 'country', 'language', 'field')
+_labels = contextvars.ContextVar('telemetry_labels', default={})
+
+@contextmanager
+def call_labels(**labels):
+    """Label the model calls and cache lookups made inside the block.
+
+    Labels nest, inner values win. Thread pool workers start with no labels,
+    so set them inside the function that runs on the worker.
+    """
+    token = _labels.set({**_labels.get(), **labels})
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+def current_labels():
+    labels = _labels.get()
+    return tuple(labels.get(name, '') for name in LABEL_NAMES)
+
+def call_cost(prompt_tokens, output_tokens):
+    return (prompt_tokens * INPUT_COST_PER_MILLION + output_tokens * OUTPUT_COST_PER_MILLION) / 1_000_000
+
+def _new_series():
+    return {
+        'calls': 0, 'errors': 0, 'retries': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+        'prompt_tokens': 0, 'output_tokens': 0, 'cost': 0.0, 'buckets': [0] * len(DURATION_BUCKETS)
+    }
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _label_text(names, values, **extra):
+    pairs = list(zip(names, values)) + list(extra.items())
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+class Telemetry:
+    """Per-call model metrics and cache outcomes, aggregated by (stage, country, language, field).
+
+    Model calls are recorded by RateLimitedModel with their duration
+    (including retries), token usage and cost. Lookups are recorded by the
+    translator for every field it finds in the cache or translation memory
+    or has to send to the model.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+        self.lookups = {}
+
+    def record_call(self, seconds, prompt_tokens=0, output_tokens=0, retries=0, error=False):
+        labels = current_labels()
+        with self.lock:
+            series = self.series.setdefault(labels, _new_series())
+            series['calls'] += 1
+            series['errors'] += int(error)
+            series['retries'] += retries
+            series['seconds'] += seconds
+            series['max_seconds'] = max(series['max_seconds'], seconds)
+            series['prompt_tokens'] += prompt_tokens
+            series['output_tokens'] += output_tokens
+            series['cost'] += call_cost(prompt_tokens, output_tokens)
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    series['buckets'][i] += 1
+                    break
+
+    def record_lookup(self, outcome):
+        """Count a cache lookup outcome: 'cache', 'memory' or 'miss'"""
+        key = current_labels() + (outcome,)
+        with self.lock:
+            self.lookups[key] = self.lookups.get(key, 0) + 1
+
+    def reset(self):
+        with self.lock:
+            self.series.clear()
+            self.lookups.clear()
+
+    def summary(self, by):
+        """Totals grouped by one label ('stage', 'country', 'language' or 'field'), most expensive first"""
+        index = LABEL_NAMES.index(by)
+        groups = {}
+        with self.lock:
+            for labels, series in self.series.items():
+                group = groups.setdefault(labels[index], {**_new_series(), 'cache': 0, 'memory': 0, 'miss': 0})
+                for name in ('calls', 'errors', 'retries', 'seconds', 'prompt_tokens', 'output_tokens', 'cost'):
+                    group[name] += series[name]
+                group['max_seconds'] = max(group['max_seconds'], series['max_seconds'])
+            for labels, count in self.lookups.items():
+                group = groups.setdefault(labels[index], {**_new_series(), 'cache': 0, 'memory': 0, 'miss': 0})
+                group[labels[-1]] += count
+
+        rows = []
+        for value, group in groups.items():
+            del group['buckets']
+            group[by] = value or '-'
+            group['mean_seconds'] = group['seconds'] / group['calls'] if group['calls'] else 0.0
+            rows.append(group)
+        rows.sort(key=lambda row: row['cost'], reverse=True)
+        return rows
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self.lock:
+            series = {labels: dict(values, buckets=list(values['buckets'])) for labels, values in self.series.items()}
+            lookups = dict(self.lookups)
+
+        lines = []
+        counters = [
+            ('gemini_calls_total', 'calls', 'Model calls'),
+            ('gemini_call_errors_total', 'errors', 'Model calls that failed after retries'),
+            ('gemini_call_retries_total', 'retries', 'Retried model call attempts'),
+            ('gemini_prompt_tokens_total', 'prompt_tokens', 'Prompt tokens reported by the model'),
+            ('gemini_output_tokens_total', 'output_tokens', 'Output tokens reported by the model'),
+            ('gemini_cost_usd_total', 'cost', 'Estimated model spend in USD'),
+        ]
+        for metric, name, help_text in counters:
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            lines += [f"{metric}{_label_text(LABEL_NAMES, labels)} {values[name]}" for labels, values in series.items()]
+
+        metric = 'gemini_call_duration_seconds'
+        lines += [f"# HELP {metric} Model call duration including retries", f"# TYPE {metric} histogram"]
+        for labels, values in series.items():
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS, values['buckets']):
+                cumulative += count
+                lines.append(f"{metric}_bucket{_label_text(LABEL_NAMES, labels, le=bound)} {cumulative}")
+            lines.append(f"{metric}_bucket{_label_text(LABEL_NAMES, labels, le='+Inf')} {values['calls']}")
+            lines.append(f"{metric}_sum{_label_text(LABEL_NAMES, labels)} {values['seconds']}")
+            lines.append(f"{metric}_count{_label_text(LABEL_NAMES, labels)} {values['calls']}")
+
+        metric = 'translation_lookups_total'
+        lines += [f"# HELP {metric} Translation lookups by outcome (cache, memory or miss)", f"# TYPE {metric} counter"]
+        lines += [f"{metric}{_label_text(LABEL_NAMES + ('outcome',), labels)} {count}" for labels, count in lookups.items()]
+        return '\n'.join(lines) + '\n'
+
+_telemetry = None
+_telemetry_lock = threading.Lock()
+_server = None
+
+def get_telemetry():
+    """Return the process-wide telemetry, creating it on first use"""
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is None:
+            _telemetry = Telemetry()
+        return _telemetry
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = get_telemetry().render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port):
+    """Serve /metrics on port from a daemon thread, once per process"""
+    global _server
+    with _telemetry_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(('0.0.0.0', port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name='metrics-server', daemon=True).start()
+        return _server
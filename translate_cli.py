@@ -0,0 +1,252 @@
+"""Translate ads without the Streamlit UI.
+
+Reads ads from a JSONL or CSV file (columns id, headline, body, link_text,
+product) or from the ad_copies table, translates and proofreads them for
+countries from country_prompts, and writes translations rows to a JSONL or
+CSV file or to the translations table:
+
+    python translate_cli.py --input ads.jsonl --countries FR,DE --output translations.jsonl
+    python translate_cli.py --from-db --to-db --workers 8
+
+Credentials come from the environment or a .env file (SUPABASE_URL,
+SUPABASE_KEY, AI_API_KEY). Ads are processed in windows of --window ads, so
+memory stays flat however large the input is. After each window the output
+is flushed and a checkpoint is saved; running the same command again
+resumes after the last finished window and first retries the ads that
+failed. The checkpoint belongs to the input (the file, or the table for
+--from-db) and is removed once a run finishes without failures. Rows of a
+window that was interrupted may be written twice.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import hashlib
+import itertools
+
+from db import BatchWriter, connect_supabase, fetch_all
+from jobs import make_task, run_task
+from gemini_client import create_model
+from translation_memory import get_memory
+from translator import AD_FIELDS, chunked, plan_unique_translations, translate_unit, run_concurrently, DEFAULT_MAX_WORKERS, MAX_LANGUAGES_PER_CALL, PACK_TOKEN_BUDGET
+
+DEFAULT_WINDOW = 200
+OUTPUT_COLUMNS = ['ad_copy_id', 'country_code', 'language'] + AD_FIELDS + ['quality_score', 'source_hashes']
+
+def read_ads(path, require_id=False):
+    """Yield ads from a JSONL or CSV file one at a time.
+
+    Rows without an id are numbered by their position, unless require_id is
+    set: ids written to the database must be real ad_copies ids, so a
+    missing or non-numeric id then stops the run.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.csv'):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for number, row in enumerate(rows, start=1):
+            ad = {name: row.get(name) or '' for name in AD_FIELDS}
+            try:
+                ad['id'] = int(row['id'])
+            except (KeyError, TypeError, ValueError):
+                if require_id:
+                    raise SystemExit(f"Row {number} of {path} has no valid id; --to-db needs the ad_copies id of every ad")
+                ad['id'] = number
+            yield ad
+
+def load_countries(supabase, codes=None):
+    countries = supabase.table('country_prompts').select('*').execute().data
+    if codes:
+        by_code = {c['country_code']: c for c in countries}
+        missing = [code for code in codes if code not in by_code]
+        if missing:
+            raise SystemExit(f"Unknown countries: {', '.join(missing)}")
+        countries = [by_code[code] for code in codes]
+    return countries
+
+class FileWriter:
+    """Appends translations rows to a JSONL or CSV file, with the add/flush/close API of BatchWriter"""
+
+    def __init__(self, path):
+        self.path = path
+        self.csv = path.endswith('.csv')
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a', newline='', encoding='utf-8')
+        self.failed_rows = []
+        if self.csv:
+            self.writer = csv.DictWriter(self.file, fieldnames=OUTPUT_COLUMNS, extrasaction='ignore')
+            if new_file:
+                self.writer.writeheader()
+
+    def add(self, rows):
+        for row in rows:
+            if self.csv:
+                self.writer.writerow({**row, 'source_hashes': json.dumps(row.get('source_hashes') or {})})
+            else:
+                self.file.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+def checkpoint_source(args):
+    """What a run reads, so a checkpoint is never resumed against other input"""
+    return 'from-db' if args.from_db else os.path.abspath(args.input)
+
+def default_checkpoint_path(args, source):
+    tag = source if args.from_db else hashlib.sha256(source.encode('utf-8')).hexdigest()[:12]
+    return f"{args.output or 'translate_cli'}.{tag}.checkpoint"
+
+def load_checkpoint(path, source):
+    checkpoint = {'source': source, 'records': 0, 'last_id': None, 'completed': 0, 'failed_ids': []}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            saved = json.load(f)
+        if saved.get('source', source) != source:
+            raise SystemExit(f"{path} is the checkpoint of a run over {saved['source']}; use --restart or another --checkpoint")
+        checkpoint.update(saved)
+    return checkpoint
+
+def save_checkpoint(path, checkpoint):
+    # Write then rename so a crash never leaves half a checkpoint
+    with open(path + '.tmp', 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(path + '.tmp', path)
+
+def read_retries(supabase, args, checkpoint):
+    """Ads the checkpoint lists as failed, read again from the input"""
+    ids = set(checkpoint['failed_ids'])
+    if not ids:
+        return iter([])
+    if args.from_db:
+        ads = []
+        for chunk in chunked(sorted(ids), 200):
+            ads.extend(supabase.table('ad_copies').select('id,' + ','.join(AD_FIELDS)).in_('id', chunk).execute().data)
+        return iter(ads)
+    done = itertools.islice(read_ads(args.input, require_id=args.to_db), checkpoint['records'])
+    return (ad for ad in done if ad['id'] in ids)
+
+def translate_window(ads, countries, model, workers, group_size, token_budget=PACK_TOKEN_BUDGET):
+    """Translate one window of ads, returning (rows, failures, unique_strings, total_strings)"""
+    tasks = [make_task(ad, group) for ad in ads for group in chunked(countries, group_size)]
+    units, total = plan_unique_translations([(task['ad'], task['countries']) for task in tasks], token_budget)
+
+    known = {}
+    for _, translated, _ in run_concurrently(lambda unit: translate_unit(unit, model), units, workers):
+        if translated:
+            known.update(translated)
+
+    rows = []
+    failures = []
+    for task, result, error in run_concurrently(lambda task: run_task(task, model, known), tasks, workers):
+        if error:
+            failures.append((task, error))
+        else:
+            rows.extend(result)
+    return rows, failures, sum(len(c) * len(texts) for c, texts in units), total
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Translate ads from a file or the ad_copies table without the UI")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--input', help="JSONL or CSV file of ads")
+    source.add_argument('--from-db', action='store_true', help="Read every row of ad_copies")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--output', help="JSONL or CSV file to append translations rows to")
+    target.add_argument('--to-db', action='store_true', help="Insert rows into the translations table")
+    parser.add_argument('--countries', help="Comma-separated country codes, all of country_prompts by default")
+    parser.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS)
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW, help="Ads held in memory at a time")
+    parser.add_argument('--languages-per-call', type=int, default=MAX_LANGUAGES_PER_CALL, help="Countries per fan-out prompt, 1 to translate each country separately")
+    parser.add_argument('--token-budget', type=int, default=PACK_TOKEN_BUDGET, help="Source tokens per packed prompt of short strings, per language")
+    parser.add_argument('--checkpoint', help="Checkpoint file, defaults to one per output and input next to the output")
+    parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint")
+    parser.add_argument('--memory', action='store_true', help="Keep the translation memory across windows; it grows with the input")
+    args = parser.parse_args(argv)
+
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    supabase = connect_supabase()
+    model = create_model(os.environ['AI_API_KEY'])
+    countries = load_countries(supabase, args.countries.split(',') if args.countries else None)
+    if not countries:
+        raise SystemExit("No countries configured in country_prompts")
+
+    source = checkpoint_source(args)
+    checkpoint_path = args.checkpoint or default_checkpoint_path(args, source)
+    checkpoint = load_checkpoint(None if args.restart else checkpoint_path, source)
+    if checkpoint['records']:
+        print(f"Resuming after {checkpoint['records']} ads, retrying {len(checkpoint['failed_ids'])} failed ones", file=sys.stderr)
+
+    retries = read_retries(supabase, args, checkpoint)
+    retry_ids = set(checkpoint['failed_ids'])
+    if args.from_db:
+        ads = fetch_all(supabase, 'ad_copies', 'id,' + ','.join(AD_FIELDS), after_id=checkpoint['last_id'])
+    else:
+        ads = itertools.islice(read_ads(args.input, require_id=args.to_db), checkpoint['records'], None)
+    writer = BatchWriter(supabase, 'translations') if args.to_db else FileWriter(args.output)
+
+    failed_ids = set()
+    window_started = time.time()
+    try:
+        for window_ads, retrying in ((retries, True), (ads, False)):
+            while True:
+                window = list(itertools.islice(window_ads, args.window))
+                if not window:
+                    break
+                saved_before = len(writer.failed_rows)
+                rows, failures, unique, total = translate_window(window, countries, model, args.workers, args.languages_per_call, args.token_budget)
+                writer.add(rows)
+                writer.flush()
+                for task, error in failures:
+                    print(f"Ad {task['ad']['id']}: {error}", file=sys.stderr)
+                failed_ids.update(task['ad']['id'] for task, _ in failures)
+                failed_ids.update(row['ad_copy_id'] for row in writer.failed_rows[saved_before:])
+
+                if retrying:
+                    retry_ids.difference_update(ad['id'] for ad in window)
+                else:
+                    checkpoint['records'] += len(window)
+                    checkpoint['last_id'] = window[-1]['id']
+                checkpoint['completed'] += len(rows)
+                checkpoint['failed_ids'] = sorted(retry_ids | failed_ids)
+                save_checkpoint(checkpoint_path, checkpoint)
+                if not args.memory:
+                    get_memory().clear()
+
+                elapsed = time.time() - window_started
+                print(
+                    f"{checkpoint['records']} ads • {checkpoint['completed']} translated • {len(failed_ids)} ads failed • "
+                    f"{unique}/{total} unique strings in window • {len(rows) / max(elapsed, 1e-6):.1f}/s",
+                    file=sys.stderr
+                )
+                window_started = time.time()
+            # Failed ads no longer in the input are not retried again
+            retry_ids.clear()
+    finally:
+        writer.close()
+
+    # A finished run leaves a checkpoint only to retry its failures
+    if failed_ids:
+        checkpoint['failed_ids'] = sorted(failed_ids)
+        save_checkpoint(checkpoint_path, checkpoint)
+        print(f"{len(failed_ids)} ads failed, run the same command again to retry them", file=sys.stderr)
+    elif os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    saved_failures = len(writer.failed_rows)
+    if saved_failures:
+        print(f"{saved_failures} translations could not be saved", file=sys.stderr)
+    return 1 if failed_ids else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Persistent tier lives next to the app unless overridden
+DEFAULT_CACHE_PATH = os.environ.get('TRANSLATION_CACHE_PATH', '.translation_cache.sqlite3')
+MEMORY_CACHE_SIZE = 2048
+
+def cache_key(*parts):
+    """Hash the inputs of a model call into a cache key"""
+    payload = json.dumps(parts, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class TranslationCache:
+    """Two-tier cache for model outputs: a bounded in-memory LRU in front of SQLite.
+
+    Entries are tagged with the target language, and translations with the
+    market (see translation_memory.market_key) whose prompts made them, so
+    they can be dropped when a country's prompts change. Keys already
+    include the prompts, so stale entries are never served, invalidation
+    just stops them piling up.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_memory_entries=MEMORY_CACHE_SIZE):
+        self.max_memory_entries = max_memory_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'writes': 0}
+
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("""CREATE TABLE IF NOT EXISTS translation_cache (
+                key TEXT PRIMARY KEY,
+                language TEXT,
+                value TEXT,
+                created_at REAL
+            )""")
+            # Cache files created before per-market invalidation lack the market tag
+            columns = {row[1] for row in self.db.execute("PRAGMA table_info(translation_cache)")}
+            if 'market' not in columns:
+                self.db.execute("ALTER TABLE translation_cache ADD COLUMN market TEXT")
+            self.db.execute("CREATE INDEX IF NOT EXISTS idx_translation_cache_language ON translation_cache (language)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS idx_translation_cache_market ON translation_cache (market)")
+            self.db.commit()
+
+    def get(self, key):
+        """Return the cached value for key, or None"""
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return self.memory[key][2]
+
+            if self.db is not None:
+                row = self.db.execute("SELECT language, market, value FROM translation_cache WHERE key = ?", (key,)).fetchone()
+                if row:
+                    value = json.loads(row[2])
+                    self._remember(key, row[0], row[1] or '', value)
+                    self.stats['disk_hits'] += 1
+                    return value
+
+            self.stats['misses'] += 1
+            return None
+
+    def set(self, key, value, language='', market=''):
+        """Store value in both tiers"""
+        with self.lock:
+            self._remember(key, language, market, value)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO translation_cache (key, language, market, value, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, language, market, json.dumps(value, ensure_ascii=False), time.time())
+                )
+                self.db.commit()
+            self.stats['writes'] += 1
+
+    def invalidate_language(self, language):
+        """Drop every entry made for a target language"""
+        with self.lock:
+            for key in [k for k, (lang, _, _) in self.memory.items() if lang == language]:
+                del self.memory[key]
+            if self.db is not None:
+                self.db.execute("DELETE FROM translation_cache WHERE language = ?", (language,))
+                self.db.commit()
+
+    def invalidate_market(self, market):
+        """Drop every translation made with a market's prompts"""
+        with self.lock:
+            for key in [k for k, (_, tag, _) in self.memory.items() if tag == market]:
+                del self.memory[key]
+            if self.db is not None:
+                self.db.execute("DELETE FROM translation_cache WHERE market = ?", (market,))
+                self.db.commit()
+
+    def clear(self):
+        """Empty both tiers"""
+        with self.lock:
+            self.memory.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM translation_cache")
+                self.db.commit()
+
+    def get_stats(self):
+        """Return hit/miss counters and the hit rate"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self.memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def _remember(self, key, language, market, value):
+        self.memory[key] = (language, market, value)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Return the process-wide cache, creating it on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TranslationCache()
+        return _cache
+
+def set_cache(cache):
+    """Replace the process-wide cache, e.g. with a memory-only one"""
+    global _cache
+    with _cache_lock:
+        _cache = cache
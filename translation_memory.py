@@ -0,0 +1,252 @@
+import re
+import json
+import zlib
+import hashlib
+import random
+import threading
+from array import array
+from collections import defaultdict
+
+from db import fetch_all
+
+# Fuzzy matching: MinHash signatures over character 4-grams, bucketed by LSH bands.
+# 8 bands of 4 rows catch pairs above roughly 0.6 Jaccard similarity.
+SHINGLE_SIZE = 4
+NUM_HASHES = 32
+BAND_ROWS = 4
+REFERENCE_SIMILARITY = 0.6
+MAX_REFERENCES = 3
+
+_masks = [random.Random(seed).getrandbits(32) for seed in range(NUM_HASHES)]
+
+# Sentence ends: Latin punctuation followed by whitespace, or CJK full stops
+SEGMENT_BOUNDARY = re.compile(r'(?<=[.!?])\s+|(?<=[\u3002\uff01\uff1f])')
+PLACEHOLDER_PATTERN = re.compile(r'<[^>]+>')
+CJK_PATTERN = re.compile(r'[\u3000-\u30ff\u3400-\u9fff\uac00-\ud7af\uff00-\uffef]')
+
+def market_key(system_prompt, user_prompt):
+    """Identify a market by its prompts, so markets sharing a language keep their own translations"""
+    return hashlib.sha256(json.dumps([system_prompt or '', user_prompt or '']).encode('utf-8')).hexdigest()[:16]
+
+def split_segments(text):
+    """Split text into sentences, keeping their end punctuation"""
+    return [segment.strip() for segment in SEGMENT_BOUNDARY.split(text or '') if segment.strip()]
+
+def _normalize(text):
+    return ' '.join(text.split())
+
+def _shingles(text):
+    # Placeholders are compared as a generic slot so <product> and <brand> still match
+    text = PLACEHOLDER_PATTERN.sub('<>', _normalize(text).lower())
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+def _signature(shingles):
+    hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles]
+    return [min(h ^ mask for h in hashes) for mask in _masks]
+
+def _bands(signature):
+    # Hashed to one int per band, a tuple key per band would cost more than the entry itself
+    return [hash((i,) + tuple(signature[i:i + BAND_ROWS])) for i in range(0, NUM_HASHES, BAND_ROWS)]
+
+def _join_segments(segments):
+    """Join translated sentences, without spaces after CJK text"""
+    text = ''
+    for segment in segments:
+        if text and not CJK_PATTERN.search(text[-1]):
+            text += ' '
+        text += segment
+    return text
+
+def _placeholders(text):
+    return sorted(PLACEHOLDER_PATTERN.findall(text))
+
+class _LanguageIndex:
+    """Exact and fuzzy lookup for one market.
+
+    Only the MinHash signature of each entry is kept, and similarity is
+    estimated from the share of signature slots that agree, so an entry
+    costs about a kilobyte on top of its text.
+    """
+
+    def __init__(self):
+        self.exact = {}
+        self.entries = []
+        self.buckets = {}
+
+    def add(self, source, target):
+        key = _normalize(source)
+        if key in self.exact:
+            self.exact[key] = target
+            return
+        self.exact[key] = target
+        signature = array('I', _signature(_shingles(source)))
+        entry_id = len(self.entries)
+        self.entries.append((source, target, signature))
+        for band in _bands(signature):
+            # One id until a second entry shares the band, to keep unique bands small
+            bucket = self.buckets.setdefault(band, entry_id)
+            if bucket != entry_id:
+                if isinstance(bucket, int):
+                    self.buckets[band] = [bucket, entry_id]
+                else:
+                    bucket.append(entry_id)
+
+    def similar(self, text, limit):
+        signature = _signature(_shingles(text))
+        candidates = set()
+        for band in _bands(signature):
+            bucket = self.buckets.get(band, ())
+            if isinstance(bucket, int):
+                candidates.add(bucket)
+            else:
+                candidates.update(bucket)
+
+        matches = []
+        for entry_id in candidates:
+            source, target, entry_signature = self.entries[entry_id]
+            similarity = sum(a == b for a, b in zip(signature, entry_signature)) / NUM_HASHES
+            matches.append((similarity, source, target))
+        matches.sort(key=lambda match: match[0], reverse=True)
+        return matches[:limit]
+
+class TranslationMemory:
+    """Sentence-level translation memory per market (target language and prompts).
+
+    Built from existing translations rows and the ad copies they came from.
+    Text whose sentences all have an exact match in the same market is
+    reused without a model call; otherwise the closest stored sentences
+    from any market with that language can be handed to the model as
+    reference translations.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.indexes = defaultdict(_LanguageIndex)
+        self.enabled = True
+        self.stats = {'lookups': 0, 'exact_hits': 0, 'reference_lookups': 0, 'fuzzy_hits': 0, 'similarity_total': 0.0}
+
+    def add(self, language, market, source, target):
+        """Store a source/target pair for a market, aligned sentence by sentence when the counts agree.
+
+        Pairs whose placeholders differ are left out, so a translation that
+        lost a placeholder is never handed out again without a model call.
+        """
+        if not source or not target or _placeholders(source) != _placeholders(target):
+            return
+        source_segments = split_segments(source)
+        target_segments = split_segments(target)
+        with self.lock:
+            index = self.indexes[(language.lower(), market)]
+            index.add(source, target)
+            if len(source_segments) > 1 and len(source_segments) == len(target_segments):
+                for source_segment, target_segment in zip(source_segments, target_segments):
+                    if _placeholders(source_segment) == _placeholders(target_segment):
+                        index.add(source_segment, target_segment)
+
+    def reuse(self, text, language, market):
+        """Return a translation assembled from exact matches made for the same market, or None if it would change the placeholders"""
+        if not self.enabled or not text:
+            return None
+        with self.lock:
+            self.stats['lookups'] += 1
+            index = self.indexes.get((language.lower(), market))
+            if index is None:
+                return None
+            whole = index.exact.get(_normalize(text))
+            if whole is None:
+                targets = [index.exact.get(_normalize(segment)) for segment in split_segments(text)]
+                if targets and all(target is not None for target in targets):
+                    whole = _join_segments(targets)
+            if whole is not None and _placeholders(whole) != _placeholders(text):
+                whole = None
+            if whole is not None:
+                self.stats['exact_hits'] += 1
+            return whole
+
+    def references(self, text, language, limit=MAX_REFERENCES, min_similarity=REFERENCE_SIMILARITY):
+        """Closest stored entries for text and each of its sentences in any market with the language, as (similarity, source, target)"""
+        if not self.enabled or not text:
+            return []
+        with self.lock:
+            indexes = [index for (name, _), index in self.indexes.items() if name == language.lower()]
+            matches = {}
+            segments = split_segments(text)
+            queries = [text] + segments if len(segments) > 1 else segments
+            for index in indexes:
+                for segment in queries:
+                    for similarity, source, target in index.similar(segment, limit):
+                        if similarity >= min_similarity and similarity > matches.get(source, (0,))[0]:
+                            matches[source] = (similarity, source, target)
+            references = sorted(matches.values(), key=lambda match: match[0], reverse=True)[:limit]
+
+            self.stats['reference_lookups'] += 1
+            if references:
+                self.stats['fuzzy_hits'] += 1
+                self.stats['similarity_total'] += references[0][0]
+            return references
+
+    def invalidate_market(self, market):
+        """Forget every pair stored for a market, e.g. after its prompts change"""
+        with self.lock:
+            for key in [key for key in self.indexes if key[1] == market]:
+                del self.indexes[key]
+
+    def clear(self):
+        """Forget every stored pair and reset the counters"""
+        with self.lock:
+            self.indexes.clear()
+            for name in self.stats:
+                self.stats[name] = 0
+            self.stats['similarity_total'] = 0.0
+
+    def load_from_supabase(self, supabase):
+        """Index every translation against the current text of its ad copy, returning the pairs added"""
+        from translator import AD_FIELDS, stale_fields
+
+        ads = {ad['id']: ad for ad in fetch_all(supabase, 'ad_copies', 'id,' + ','.join(AD_FIELDS))}
+        markets = {
+            country['country_code']: market_key(country['system_prompt'], country['user_prompt'])
+            for country in fetch_all(supabase, 'country_prompts', 'id,country_code,system_prompt,user_prompt')
+        }
+        added = 0
+        for row in fetch_all(supabase, 'translations', 'id,ad_copy_id,country_code,language,source_hashes,' + ','.join(AD_FIELDS)):
+            ad = ads.get(row['ad_copy_id'])
+            market = markets.get(row['country_code'])
+            if ad is None or market is None:
+                continue
+            # Skip fields whose source was edited after they were translated
+            stale = stale_fields(ad, row) if row.get('source_hashes') else []
+            for name in AD_FIELDS:
+                if name not in stale and ad.get(name) and row.get(name):
+                    self.add(row['language'], market, ad[name], row[name])
+                    added += 1
+        return added
+
+    def get_stats(self):
+        """Hit counts, hit rates, average similarity of the best fuzzy match and index sizes.
+
+        Every exact hit is a model call saved.
+        """
+        with self.lock:
+            stats = dict(self.stats)
+            segments = defaultdict(int)
+            for (language, _), index in self.indexes.items():
+                segments[language] += len(index.entries)
+        stats['segments'] = dict(segments)
+        stats['exact_hit_rate'] = stats['exact_hits'] / stats['lookups'] if stats['lookups'] else 0.0
+        stats['fuzzy_hit_rate'] = stats['fuzzy_hits'] / stats['reference_lookups'] if stats['reference_lookups'] else 0.0
+        stats['average_similarity'] = stats.pop('similarity_total') / stats['fuzzy_hits'] if stats['fuzzy_hits'] else 0.0
+        return stats
+
+_memory = None
+_memory_lock = threading.Lock()
+
+def get_memory():
+    """Return the process-wide translation memory, creating it on first use"""
+    global _memory
+    with _memory_lock:
+        if _memory is None:
+            _memory = TranslationMemory()
+        return _memory
@@ -0,0 +1,656 @@
+import re
+import json
+import hashlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from translation_cache import cache_key, get_cache
+from translation_memory import get_memory, market_key, MAX_REFERENCES
+from telemetry import call_labels, get_telemetry
+from gemini_client import estimate_tokens
+
+# Number of (ad, country) tasks translated at the same time
+DEFAULT_MAX_WORKERS = 4
+MAX_WORKERS_LIMIT = 16
+
+# Ad copy fields that get translated
+AD_FIELDS = ['headline', 'body', 'link_text', 'product']
+
+# Ask Gemini for a bare JSON response instead of free text
+JSON_RESPONSE_CONFIG = {"response_mime_type": "application/json"}
+
+# Languages combined into one fan-out prompt, keeps the response under the output-token limit
+MAX_LANGUAGES_PER_CALL = 5
+
+# Source tokens packed into one prompt when many short strings go to the same languages,
+# counted once per language because each comes back translated into every one of them
+PACK_TOKEN_BUDGET = 2000
+MAX_PACKED_STRINGS = 200
+# Numbering, quoting and JSON keys added around every packed string
+PACKED_ITEM_OVERHEAD_TOKENS = 4
+
+# Extra attempts for a field whose translation lost or duplicated a placeholder
+MAX_PLACEHOLDER_RETRIES = 2
+
+PLACEHOLDER_PATTERN = re.compile(r'<[^>]+>')
+MARKER_PATTERN = re.compile(r'__PLACEHOLDER_(\d+)__')
+
+def extract_placeholders(text):
+    """Extract all <placeholder> tags from text"""
+    return PLACEHOLDER_PATTERN.findall(text)
+
+def mask_placeholders(text):
+    """Replace <placeholder> tags with __PLACEHOLDER_i__ markers in a single pass.
+
+    Repeated tags share one marker. Returns (masked_text, placeholders)
+    where placeholders[i] is the tag behind marker i.
+    """
+    placeholders = []
+    indexes = {}
+
+    def mask(match):
+        tag = match.group()
+        if tag not in indexes:
+            indexes[tag] = len(placeholders)
+            placeholders.append(tag)
+        return f"__PLACEHOLDER_{indexes[tag]}__"
+
+    return PLACEHOLDER_PATTERN.sub(mask, text), placeholders
+
+def restore_placeholders(text, placeholders):
+    """Put the original <placeholder> tags back in place of the markers in a single pass"""
+    def unmask(match):
+        index = int(match.group(1))
+        return placeholders[index] if index < len(placeholders) else match.group()
+
+    return MARKER_PATTERN.sub(unmask, text)
+
+def placeholders_intact(source, translated):
+    """Check the translation has exactly the same placeholders as the source, counting repeats"""
+    return Counter(extract_placeholders(source)) == Counter(extract_placeholders(translated)) and not MARKER_PATTERN.search(translated)
+
+def _restore_checked(value, text, placeholders):
+    """Restore a translated field, or return None if it is empty or lost a placeholder"""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    restored = restore_placeholders(value.strip(), placeholders)
+    return restored if placeholders_intact(text, restored) else None
+
+def parse_json_object(text):
+    """Parse the first JSON object in a model response, raising ValueError if there is none"""
+    json_match = re.search(r'\{.*\}', text, re.DOTALL)
+    if not json_match:
+        raise ValueError("No JSON object in response")
+    result = json.loads(json_match.group())
+    if not isinstance(result, dict):
+        raise ValueError("Response is not a JSON object")
+    return result
+
+def _model_name(model):
+    return getattr(model, 'model_name', '')
+
+def _translation_key(text, target_language, user_prompt, system_prompt, model):
+    return cache_key('translate', text, target_language, system_prompt, user_prompt, _model_name(model))
+
+def _field_labels(names):
+    """Telemetry field label for a set of ad fields, empty for other names so the caller's label stays"""
+    names = sorted(name for name in names if name in AD_FIELDS)
+    return {'field': '+'.join(names)} if names else {}
+
+def _split_cached(fields, target_language, user_prompt, system_prompt, model):
+    """Return (translations found in the cache or translation memory, fields that still need the model)"""
+    cache = get_cache()
+    memory = get_memory()
+    telemetry = get_telemetry()
+    cached = {}
+    missing = {}
+    for name, text in fields.items():
+        outcome = 'cache'
+        value = cache.get(_translation_key(text, target_language, user_prompt, system_prompt, model))
+        if value is None:
+            outcome = 'memory'
+            value = memory.reuse(text, target_language, market_key(system_prompt, user_prompt))
+        if value is None:
+            outcome = 'miss'
+            missing[name] = text
+        else:
+            cached[name] = value
+        with call_labels(stage='translate', language=target_language, **_field_labels([name])):
+            telemetry.record_lookup(outcome)
+    return cached, missing
+
+def _reference_block(texts, target_language):
+    """Prompt section with close matches from the translation memory, empty if there are none"""
+    references = {}
+    for text in texts:
+        for similarity, source, target in get_memory().references(text, target_language):
+            references.setdefault(source, (similarity, target))
+    if not references:
+        return ""
+    best = sorted(references.items(), key=lambda item: item[1][0], reverse=True)[:MAX_REFERENCES]
+    lines = "\n".join(f'- "{source}" → "{target}"' for source, (_, target) in best)
+    return f"""
+
+Reference translations of similar sentences from earlier ads, reuse their wording where it fits:
+{lines}"""
+
+def _remember_row(ad, row, country):
+    """Add the fields of a finished translations row to the translation memory of its market"""
+    memory = get_memory()
+    market = market_key(country['system_prompt'], country['user_prompt'])
+    for name in AD_FIELDS:
+        memory.add(row['language'], market, ad.get(name), row.get(name))
+
+def _store_translation(text, translated, target_language, user_prompt, system_prompt, model):
+    key = _translation_key(text, target_language, user_prompt, system_prompt, model)
+    get_cache().set(key, translated, target_language, market_key(system_prompt, user_prompt))
+
+def _text_prompt(text, temp_text, target_language, user_prompt, system_prompt):
+    return f"""{system_prompt}
+
+{user_prompt}{_reference_block([text], target_language)}
+
+Translate the following text to {target_language}. 
+IMPORTANT: Keep __PLACEHOLDER_X__ markers exactly as they are, do not translate them.
+
+Text to translate:
+{temp_text}
+
+Return ONLY the translated text, no explanations."""
+
+def translate_text(text, target_language, user_prompt, system_prompt, model):
+    """Translate text while preserving placeholders"""
+    if not text:
+        return text
+
+    cached, _ = _split_cached({'text': text}, target_language, user_prompt, system_prompt, model)
+    if cached:
+        return cached['text']
+    return _translate_text(text, target_language, user_prompt, system_prompt, model)
+
+def _translate_text(text, target_language, user_prompt, system_prompt, model):
+    """Translate text with one model call and cache the result.
+
+    If the translation does not keep every placeholder it is retried up to
+    MAX_PLACEHOLDER_RETRIES times. A result that still fails the check is
+    returned but not cached.
+    """
+    # Replace placeholders with markers
+    temp_text, placeholders = mask_placeholders(text)
+
+    # Translate
+    prompt = _text_prompt(text, temp_text, target_language, user_prompt, system_prompt)
+
+    for attempt in range(MAX_PLACEHOLDER_RETRIES + 1):
+        if attempt:
+            markers = ", ".join(f"__PLACEHOLDER_{i}__" for i in range(len(placeholders)))
+            prompt += f"\n\nYour previous answer lost some markers. Every one of these must appear as often as in the source text: {markers}"
+        with call_labels(stage='translate', language=target_language):
+            response = model.generate_content(prompt)
+
+        # Restore placeholders
+        translated = restore_placeholders(response.text.strip(), placeholders)
+        if placeholders_intact(text, translated):
+            _store_translation(text, translated, target_language, user_prompt, system_prompt, model)
+            return translated
+
+    return translated
+
+def stream_translation(text, target_language, user_prompt, system_prompt, model):
+    """Translate text with a streaming call, yielding the translation so far as chunks arrive.
+
+    The last value yielded is the final translation. A cached result is
+    yielded at once, and a streamed result that lost a placeholder is
+    replaced by a regular translate call with retries.
+    """
+    if not text:
+        yield text
+        return
+
+    cached, _ = _split_cached({'text': text}, target_language, user_prompt, system_prompt, model)
+    if cached:
+        yield cached['text']
+        return
+
+    temp_text, placeholders = mask_placeholders(text)
+    prompt = _text_prompt(text, temp_text, target_language, user_prompt, system_prompt)
+    streamed = ''
+    # The stream records its telemetry when it ends, so it is consumed inside the labels
+    with call_labels(stage='translate', language=target_language):
+        for chunk in model.generate_content(prompt, stream=True):
+            streamed += chunk.text
+            yield restore_placeholders(streamed, placeholders)
+
+    translated = restore_placeholders(streamed.strip(), placeholders)
+    if placeholders_intact(text, translated):
+        _store_translation(text, translated, target_language, user_prompt, system_prompt, model)
+        yield translated
+    else:
+        yield _translate_text(text, target_language, user_prompt, system_prompt, model)
+
+def translate_fields(fields, target_language, user_prompt, system_prompt, model):
+    """Translate several text fields with one JSON-mode call.
+
+    Returns a dict keyed by field name. Empty fields are skipped, and any
+    field missing from an unparseable or incomplete response is translated
+    on its own with translate_text. Cached fields are not sent again.
+    """
+    fields = {name: text for name, text in fields.items() if text}
+    translations, missing = _split_cached(fields, target_language, user_prompt, system_prompt, model)
+    translations.update(_translate_fields(missing, target_language, user_prompt, system_prompt, model))
+    return translations
+
+def _translate_fields(fields, target_language, user_prompt, system_prompt, model):
+    """Translate uncached fields with one JSON-mode call"""
+    if len(fields) <= 1:
+        return {name: _translate_text(text, target_language, user_prompt, system_prompt, model) for name, text in fields.items()}
+
+    # Mask placeholders per field, markers are numbered within each field
+    masked = {}
+    placeholders = {}
+    for name, text in fields.items():
+        masked[name], placeholders[name] = mask_placeholders(text)
+
+    prompt = f"""{system_prompt}
+
+{user_prompt}{_reference_block(fields.values(), target_language)}
+
+Translate the value of every field in the following JSON object to {target_language}.
+IMPORTANT: Keep __PLACEHOLDER_X__ markers exactly as they are, do not translate them. Do not translate the field names.
+
+Fields to translate:
+{json.dumps(masked, ensure_ascii=False, indent=2)}
+
+Return ONLY a JSON object with the same field names and the translated text as values."""
+
+    try:
+        with call_labels(stage='translate', language=target_language, **_field_labels(fields)):
+            response = model.generate_content(prompt, generation_config=JSON_RESPONSE_CONFIG)
+        result = parse_json_object(response.text)
+    except ValueError:
+        result = {}
+
+    translations = {}
+    for name, text in fields.items():
+        restored = _restore_checked(result.get(name), text, placeholders[name])
+        if restored is not None:
+            translations[name] = restored
+            _store_translation(text, restored, target_language, user_prompt, system_prompt, model)
+        else:
+            # Fall back to a single-field call for this field only
+            with call_labels(**_field_labels([name])):
+                translations[name] = _translate_text(text, target_language, user_prompt, system_prompt, model)
+
+    return translations
+
+def pack_texts(texts, token_budget=PACK_TOKEN_BUDGET, max_items=MAX_PACKED_STRINGS):
+    """Bin-pack texts into batches of at most token_budget estimated tokens, first fit decreasing.
+
+    A text over the budget gets a batch of its own. Batches keep the
+    original order of their texts.
+    """
+    sizes = {i: estimate_tokens(text) + PACKED_ITEM_OVERHEAD_TOKENS for i, text in enumerate(texts)}
+    bins = []
+    for i in sorted(sizes, key=sizes.get, reverse=True):
+        for batch in bins:
+            if batch[0] + sizes[i] <= token_budget and len(batch[1]) < max_items:
+                batch[0] += sizes[i]
+                batch[1].append(i)
+                break
+        else:
+            bins.append([sizes[i], [i]])
+    return [[texts[i] for i in sorted(indexes)] for _, indexes in bins]
+
+def translate_batch(texts, target_language, user_prompt, system_prompt, model):
+    """Translate many independent texts, like the headlines of different ads, with one packed call.
+
+    Returns a dict mapping each text to its translation. Cached texts are
+    not sent, and any text missing or malformed in the response is
+    translated again on its own with translate_text.
+    """
+    texts = list(dict.fromkeys(text for text in texts if text))
+    fields = {str(i + 1): text for i, text in enumerate(texts)}
+    translations, missing = _split_cached(fields, target_language, user_prompt, system_prompt, model)
+    translations.update(_translate_packed(missing, target_language, user_prompt, system_prompt, model))
+    return {fields[number]: translated for number, translated in translations.items()}
+
+def _translate_packed(fields, target_language, user_prompt, system_prompt, model):
+    """Translate uncached texts keyed by item number with one JSON-mode call over a numbered list"""
+    if len(fields) <= 1:
+        return {number: _translate_text(text, target_language, user_prompt, system_prompt, model) for number, text in fields.items()}
+
+    masked = {}
+    placeholders = {}
+    for number, text in fields.items():
+        masked[number], placeholders[number] = mask_placeholders(text)
+    # Each item is a JSON string so line breaks inside an ad body cannot split the list
+    items = "\n".join(f"{number}. {json.dumps(text, ensure_ascii=False)}" for number, text in masked.items())
+
+    prompt = f"""{system_prompt}
+
+{user_prompt}{_reference_block(fields.values(), target_language)}
+
+Translate every numbered item below to {target_language}. The items are separate ad texts, translate each one on its own.
+IMPORTANT: Keep __PLACEHOLDER_X__ markers exactly as they are, do not translate them.
+
+Items to translate:
+{items}
+
+Return ONLY a JSON object mapping every item number, as a string, to its translated text."""
+
+    try:
+        with call_labels(stage='pack', language=target_language):
+            response = model.generate_content(prompt, generation_config=JSON_RESPONSE_CONFIG)
+        result = parse_json_object(response.text)
+    except ValueError:
+        result = {}
+
+    translations = {}
+    for number, text in fields.items():
+        restored = _restore_checked(result.get(number), text, placeholders[number])
+        if restored is not None:
+            translations[number] = restored
+            _store_translation(text, restored, target_language, user_prompt, system_prompt, model)
+        else:
+            # Re-send only the items that came back missing or broken
+            translations[number] = _translate_text(text, target_language, user_prompt, system_prompt, model)
+    return translations
+
+def proofread_translation(original, translated, language, model):
+    """Proofread translation and return quality score"""
+    cache = get_cache()
+    key = cache_key('proofread', original, translated, language, _model_name(model))
+    cached = cache.get(key)
+    with call_labels(stage='proofread', language=language, field='body'):
+        get_telemetry().record_lookup('miss' if cached is None else 'cache')
+        if cached is not None:
+            return tuple(cached)
+
+        score, corrected, feedback = _proofread_translation(original, translated, language, model)
+    cache.set(key, [score, corrected, feedback], language)
+    return score, corrected, feedback
+
+def _proofread_translation(original, translated, language, model):
+    prompt = f"""You are a translation quality expert. Evaluate this translation from English to {language}.
+
+Original: {original}
+Translation: {translated}
+
+Rate the translation quality from 0-100 based on:
+- Accuracy (meaning preserved)
+- Fluency (natural in target language)
+- Marketing tone (persuasive and engaging)
+- Grammar and spelling
+
+If there are errors, provide a corrected version.
+
+Respond ONLY in this JSON format:
+{{"score": <0-100>, "corrected": "<corrected translation or original if good>", "feedback": "<brief feedback>"}}"""
+
+    response = model.generate_content(prompt)
+    result_text = response.text.strip()
+
+    # Extract JSON
+    json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
+    if json_match:
+        result = json.loads(json_match.group())
+        return result['score'], result['corrected'], result.get('feedback', '')
+
+    return 85, translated, "Auto-approved"
+
+def chunked(items, size):
+    """Split a list into consecutive chunks of at most size items"""
+    size = max(1, size)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def translate_fields_to_countries(fields, countries, model, max_languages=MAX_LANGUAGES_PER_CALL):
+    """Translate the same fields into every country's language.
+
+    Countries are grouped into one prompt per max_languages countries, each
+    keeping its own system and user prompt. Returns a dict keyed by
+    country_code holding the translate_fields result for that country.
+    """
+    fields = {name: text for name, text in fields.items() if text}
+    results = {}
+    missing = {}
+    for country in countries:
+        with call_labels(country=country['country_code']):
+            results[country['country_code']], missing[country['country_code']] = _split_cached(
+                fields, country['language'], country['user_prompt'], country['system_prompt'], model
+            )
+
+    # Only countries with uncached fields take part in a request
+    pending = [c for c in countries if missing[c['country_code']]]
+    for group in chunked(pending, max_languages):
+        if len(group) == 1:
+            country = group[0]
+            with call_labels(country=country['country_code']):
+                results[country['country_code']].update(_translate_fields(
+                    missing[country['country_code']], country['language'], country['user_prompt'], country['system_prompt'], model
+                ))
+            continue
+
+        group_fields = {}
+        for country in group:
+            group_fields.update(missing[country['country_code']])
+        with call_labels(country='+'.join(c['country_code'] for c in group)):
+            translated_group = _translate_country_group(group_fields, group, model)
+        for code, translated in translated_group.items():
+            results[code] = {**translated, **results[code]}
+    return results
+
+def _translate_country_group(fields, countries, model):
+    """Run one fan-out call for a group of countries, falling back per country"""
+    masked = {}
+    placeholders = {}
+    for name, text in fields.items():
+        masked[name], placeholders[name] = mask_placeholders(text)
+
+    markets = "\n\n".join(
+        f"""Market {c['country_code']} ({c['language']}):
+System prompt: {c['system_prompt']}
+User prompt: {c['user_prompt']}"""
+        for c in countries
+    )
+    codes = ", ".join(f'"{c["country_code"]}"' for c in countries)
+
+    prompt = f"""You are translating the same marketing copy for several markets. Each market has its own instructions, apply them only to that market's translation.
+
+{markets}
+
+Translate the value of every field in the following JSON object into the language of each market.
+IMPORTANT: Keep __PLACEHOLDER_X__ markers exactly as they are, do not translate them. Do not translate the field names.
+
+Fields to translate:
+{json.dumps(masked, ensure_ascii=False, indent=2)}
+
+Return ONLY a JSON object keyed by market code ({codes}). Each value must be an object with the same field names and the translated text as values."""
+
+    try:
+        # One call covers several markets, so it is labelled with all of their languages
+        with call_labels(stage='fanout', language='+'.join(c['language'] for c in countries), **_field_labels(fields)):
+            response = model.generate_content(prompt, generation_config=JSON_RESPONSE_CONFIG)
+        result = parse_json_object(response.text)
+    except ValueError:
+        result = {}
+
+    results = {}
+    for country in countries:
+        code = country['country_code']
+        translated = result.get(code)
+        if not isinstance(translated, dict):
+            translated = {}
+
+        results[code] = {}
+        missing = {}
+        for name, text in fields.items():
+            restored = _restore_checked(translated.get(name), text, placeholders[name])
+            if restored is not None:
+                results[code][name] = restored
+                _store_translation(text, restored, country['language'], country['user_prompt'], country['system_prompt'], model)
+            else:
+                missing[name] = text
+
+        # Retry whatever this market did not get back on its own
+        if missing:
+            with call_labels(country=code):
+                results[code].update(_translate_fields(
+                    missing, country['language'], country['user_prompt'], country['system_prompt'], model
+                ))
+    return results
+
+def source_fingerprint(text):
+    """Short hash of a source field, stored with translations to spot edits"""
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()[:16]
+
+def source_hashes(ad):
+    return {name: source_fingerprint(ad.get(name)) for name in AD_FIELDS}
+
+def stale_fields(ad, translation):
+    """Fields whose source text changed since the translation was made.
+
+    Rows saved before fingerprints existed count as stale in every field.
+    """
+    stored = translation.get('source_hashes') or {}
+    current = source_hashes(ad)
+    return [name for name in AD_FIELDS if stored.get(name) != current[name]]
+
+def refresh_translation(ad, translation, country, model):
+    """Re-translate only the stale fields of an existing translations row and return the updated row"""
+    with call_labels(country=country['country_code']):
+        row = dict(translation)
+        stale = stale_fields(ad, translation)
+        translated = translate_fields(
+            {name: ad.get(name) or '' for name in stale},
+            country['language'],
+            country['user_prompt'],
+            country['system_prompt'],
+            model
+        )
+        for name in stale:
+            row[name] = translated.get(name, '')
+
+        # The quality score is about the body, so only a new body is proofread again
+        if 'body' in stale:
+            score, corrected_body, _ = proofread_translation(ad['body'], row['body'], country['language'], model)
+            row['body'] = corrected_body
+            row['quality_score'] = score
+
+        row['source_hashes'] = source_hashes(ad)
+        _remember_row(ad, row, country)
+        return row
+
+def plan_unique_translations(tasks, token_budget=PACK_TOKEN_BUDGET):
+    """Collect the distinct (country, text) pairs behind a batch of (ad, countries) tasks.
+
+    Returns (units, total_strings). Each unit is (countries, texts): distinct
+    texts that still need translating into those countries, packed with
+    pack_texts so the texts times the number of countries stay within
+    token_budget. Texts shared by many ads, like "Shop now", appear in
+    exactly one unit per country.
+    """
+    seen = set()
+    groups = {}
+    total = 0
+    for ad, countries in tasks:
+        by_code = {c['country_code']: c for c in countries}
+        for name in AD_FIELDS:
+            text = ad.get(name)
+            if not text:
+                continue
+            total += len(countries)
+            codes = tuple(code for code in by_code if (code, text) not in seen)
+            if not codes:
+                continue
+            seen.update((code, text) for code in codes)
+            group = groups.setdefault(codes, ([by_code[code] for code in codes], []))
+            group[1].append(text)
+
+    units = [
+        (countries, batch)
+        for countries, texts in groups.values()
+        for batch in pack_texts(texts, max(1, token_budget // len(countries)))
+    ]
+    return units, total
+
+def translate_unit(unit, model, max_languages=MAX_LANGUAGES_PER_CALL):
+    """Translate one planned unit, returning {(country_code, text): translation}"""
+    countries, texts = unit
+    if len(countries) == 1:
+        country = countries[0]
+        with call_labels(country=country['country_code']):
+            translations = translate_batch(texts, country['language'], country['user_prompt'], country['system_prompt'], model)
+        return {(country['country_code'], text): translated for text, translated in translations.items()}
+
+    translations = translate_fields_to_countries({str(i): text for i, text in enumerate(texts)}, countries, model, max_languages)
+    return {
+        (code, texts[int(i)]): translated
+        for code, fields in translations.items()
+        for i, translated in fields.items()
+    }
+
+def translate_ad_to_countries(ad, countries, model, max_languages=MAX_LANGUAGES_PER_CALL, known=None):
+    """Translate and proofread an ad for several countries, returning one translations row per country.
+
+    known maps (country_code, text) to translations already made for the
+    batch (see plan_unique_translations). Countries it fully covers skip the
+    translation call.
+    """
+    fields = {name: ad.get(name) or '' for name in AD_FIELDS}
+    translations = {}
+    pending = []
+    for country in countries:
+        code = country['country_code']
+        found = {name: known[(code, text)] for name, text in fields.items() if text and (code, text) in (known or {})}
+        if len(found) == sum(1 for text in fields.values() if text):
+            translations[code] = found
+        else:
+            pending.append(country)
+    if pending:
+        translations.update(translate_fields_to_countries(fields, pending, model, max_languages))
+
+    rows = []
+    for country in countries:
+        fields = translations[country['country_code']]
+        body_trans = fields.get('body', '')
+
+        # Proofread
+        with call_labels(country=country['country_code']):
+            score, corrected_body, _ = proofread_translation(ad['body'], body_trans, country['language'], model)
+
+        row = {
+            'ad_copy_id': ad['id'],
+            'country_code': country['country_code'],
+            'language': country['language'],
+            'headline': fields.get('headline', ''),
+            'body': corrected_body,
+            'link_text': fields.get('link_text', ''),
+            'product': fields.get('product', ''),
+            'quality_score': score,
+            'source_hashes': source_hashes(ad)
+        }
+        _remember_row(ad, row, country)
+        rows.append(row)
+    return rows
+
+def translate_ad(ad, country, model):
+    """Translate every field of an ad for one country and return the translations row"""
+    return translate_ad_to_countries(ad, [country], model)[0]
+
+def run_concurrently(func, items, max_workers=DEFAULT_MAX_WORKERS):
+    """Run func over items on a bounded thread pool.
+
+    Yields (item, result, error) in completion order so the caller can report
+    progress from its own thread. A failing item does not stop the others.
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, MAX_WORKERS_LIMIT)))
+    try:
+        futures = {executor.submit(func, item): item for item in items}
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                yield item, future.result(), None
+            except Exception as e:
+                yield item, None, e
+    finally:
+        # Drop queued work if the caller stops consuming early
+        executor.shutdown(wait=True, cancel_futures=True)